@@ -0,0 +1,120 @@
+"""Contention tests for the reader-writer locking: reader threads check everything they
+see while a single writer updates, and the structures must pass their own checks after."""
+import random
+import threading
+
+import pytest
+
+from tree_dsa_gui import ConcurrentTree, InventoryManager, create_tree
+
+
+def run_contended(reader, writer, readers: int = 4):
+    # Readers loop until the writer is done; returns the problems they reported and how
+    # many reads they made
+    done = threading.Event()
+    errors, reads = [], [0] * readers
+
+    def loop(index: int):
+        rng = random.Random(index)
+        while True:
+            finished = done.is_set()  # One more pass after the writer stops
+            problem = reader(rng)
+            if problem:
+                errors.append(problem)
+            reads[index] += 1
+            if finished:
+                return
+
+    threads = [threading.Thread(target=loop, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    try:
+        writer()
+    finally:
+        done.set()
+        for thread in threads:
+            thread.join()
+    return errors, sum(reads)
+
+
+@pytest.mark.parametrize("backend", ["bst", "avl", "redblack", "treap", "array_avl", "bplus", "skiplist"])
+def test_concurrent_tree_under_contention(backend):
+    tree = ConcurrentTree(create_tree(backend))
+    stable = range(0, 2000, 2)  # Even keys are never touched by the writer
+    tree.bulk_insert(stable)
+    expected = set(stable)
+
+    def reader(rng):
+        lo = rng.randrange(2000)
+        scan = list(tree.range(lo, lo + 100))
+        if scan != sorted(set(scan)):
+            return f"range({lo}, {lo + 100}) out of order"
+        if not set(range(lo + lo % 2, min(lo + 101, 2000), 2)) <= set(scan):
+            return f"range({lo}, {lo + 100}) lost a stable key"
+        with tree.lock.read():  # Reentrant, so both calls see the same state
+            values, size = tree.traverse_inorder(), tree.get_size()
+        if len(values) != size:
+            return f"traversal has {len(values)} values but size is {size}"
+        if values != sorted(values):
+            return "traversal out of order"
+        if not tree.search(rng.randrange(0, 2000, 2)):
+            return "stable key not found"
+
+    def writer():
+        rng = random.Random(1)
+        for _ in range(2000):
+            key = rng.randrange(1, 2000, 2)
+            if rng.random() < 0.6:
+                tree.insert(key)
+                expected.add(key)
+            else:
+                tree.delete(key)
+                expected.discard(key)
+
+    errors, reads = run_contended(reader, writer)
+    assert errors == []
+    assert reads > 0
+    assert tree.check_invariants() == []
+    assert tree.traverse_inorder() == sorted(expected)
+
+
+@pytest.mark.parametrize("options", [{}, {"product_backend": "bplus", "stock_backend": "skiplist"},
+                                     {"versioned": True}])
+def test_inventory_under_contention(options):
+    inventory = InventoryManager(concurrent=True, **options)
+    rng = random.Random(0)
+    stable = 500  # Products 1..500 are re-stocked but never deleted
+    for i in range(stable):
+        inventory.add_product(f"p{i}", 1.0 + i % 7, rng.randint(0, 50), f"c{i % 10}")
+
+    def reader(rng):
+        # Products are updated in place, so each check holds the read lock throughout
+        with inventory.lock.read():
+            threshold = rng.randint(0, 50)
+            keys = [(p.quantity, p.product_id) for p in inventory.get_low_stock_products(threshold)]
+            if keys != sorted(keys) or (keys and keys[-1][0] > threshold):
+                return "low stock scan out of order"
+            category = f"c{rng.randrange(10)}"
+            summary = inventory.get_category_summary(category)
+            scan = inventory.get_products_by_category(category)
+            if summary["skus"] != len(scan) or summary["units"] != sum(p.quantity for p in scan):
+                return "category summary disagrees with its scan"
+            if any(p.category != category for p in scan):
+                return "category scan returned another category"
+            if inventory.find_product(rng.randint(1, stable)) is None:
+                return "product vanished"
+
+    def writer():
+        rng = random.Random(1)
+        for step in range(1500):
+            if step % 10 == 0:
+                inventory.add_product(f"n{step}", 2.0, rng.randint(0, 50), f"c{rng.randrange(10)}")
+            elif step % 10 == 1:
+                inventory.delete_product(rng.randint(stable + 1, inventory.product_counter))
+            else:
+                inventory.update_stock(rng.randint(1, stable), rng.randint(0, 50))
+
+    errors, reads = run_contended(reader, writer)
+    assert errors == []
+    assert reads > 0
+    assert inventory.check_invariants() == []
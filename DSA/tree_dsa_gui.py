@@ -6,13 +6,34 @@ Integrating DSA trees with real-world projects using Tkinter
 
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
+import asyncio
+import io
+import mmap
+import os
 import random
+import struct
+import sys
+import threading
 import time
-from typing import Any, List, Optional, Tuple, Dict, Deque
-from collections import deque
-import json
+import zlib
+from array import array
+from datetime import date, datetime
+from typing import Any, List, Optional, Tuple, Dict, Deque, Iterator, Callable, Iterable, NamedTuple
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import wraps
+from itertools import islice, takewhile
+from heapq import merge, nlargest
+from bisect import bisect_left, bisect_right
+import multiprocessing
 from abc import ABC, abstractmethod
 
+try:
+    import numpy as np  # Optional: vectorized recommendation scoring
+except ImportError:
+    np = None
+
 # =============================================================================
 # TREE DATA STRUCTURES (From previous implementation)
 # =============================================================================
@@ -38,82 +59,513 @@ class TreeInterface(ABC):
     def find_min(self) -> Any: pass
     @abstractmethod
     def find_max(self) -> Any: pass
+    @abstractmethod
+    def get(self, key: Any) -> Any: pass
+    @abstractmethod
+    def contains_key(self, key: Any) -> bool: pass
+    @abstractmethod
+    def delete_key(self, key: Any) -> bool: pass
+    @abstractmethod
+    def iter_inorder(self) -> Iterator[Any]: pass
+    @abstractmethod
+    def iter_preorder(self) -> Iterator[Any]: pass
+    @abstractmethod
+    def iter_postorder(self) -> Iterator[Any]: pass
+    @abstractmethod
+    def iter_levelorder(self) -> Iterator[Any]: pass
+    @abstractmethod
+    def __reversed__(self) -> Iterator[Any]: pass
+    @abstractmethod
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]: pass
+    @abstractmethod
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int: pass
+    @abstractmethod
+    def floor(self, key: Any) -> Any: pass
+    @abstractmethod
+    def ceiling(self, key: Any) -> Any: pass
+    @abstractmethod
+    def successor(self, key: Any) -> Any: pass
+    @abstractmethod
+    def predecessor(self, key: Any) -> Any: pass
+    @classmethod
+    @abstractmethod
+    def from_sorted(cls, values: Iterable[Any], **kwargs) -> 'TreeInterface': pass
+    @abstractmethod
+    def bulk_insert(self, values: Iterable[Any]) -> int: pass
+    
+    read_only = False  # True for engines without single-value insert/delete
+    
+    def replace(self, value: Any) -> bool:
+        # Store `value` under its existing key; engines that can swap it in place override this
+        return self.delete(value) and self.insert(value)
+    
+    def __iter__(self) -> Iterator[Any]: return self.iter_inorder()
+    def __len__(self) -> int: return self.get_size()
+    def __contains__(self, value: Any) -> bool: return self.search(value)
+
+def _iter_inorder(node) -> Iterator[Any]:
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node.value
+        node = node.right
+
+def _iter_reverse_inorder(node) -> Iterator[Any]:
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.right
+        node = stack.pop()
+        yield node.value
+        node = node.left
+
+def _iter_preorder(node) -> Iterator[Any]:
+    stack = [node] if node is not None else []
+    while stack:
+        node = stack.pop()
+        yield node.value
+        if node.right is not None: stack.append(node.right)
+        if node.left is not None: stack.append(node.left)
+
+def _iter_postorder(node) -> Iterator[Any]:
+    stack = []
+    last = None
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+        top = stack[-1]
+        if top.right is not None and top.right is not last:
+            node = top.right
+        else:
+            yield top.value
+            last = stack.pop()
+
+def _iter_levelorder(node) -> Iterator[Any]:
+    queue = deque([node] if node is not None else [])
+    while queue:
+        node = queue.popleft()
+        yield node.value
+        if node.left is not None: queue.append(node.left)
+        if node.right is not None: queue.append(node.right)
+
+def _iter_range(node, lo: Any, hi: Any, inclusive: Any) -> Iterator[Any]:
+    # Bounds apply to node keys; None leaves that side open. inclusive is a bool or a (lo, hi) pair.
+    lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+    stack = []
+    def descend(node):
+        # Seek to the first key inside the lower bound, keeping the left spine on the stack
+        while node is not None:
+            if lo is None or lo < node.key or (lo_inc and lo == node.key):
+                stack.append(node)
+                node = node.left
+            else:
+                node = node.right
+    descend(node)
+    while stack:
+        node = stack.pop()
+        if hi is not None and (hi < node.key or (not hi_inc and hi == node.key)):
+            return
+        yield node.value
+        descend(node.right)
+
+def _floor_node(node, key: Any, strict: bool = False):
+    best = None
+    while node is not None:
+        if node.key < key or (not strict and node.key == key):
+            best = node
+            node = node.right
+        else:
+            node = node.left
+    return best
+
+def _ceiling_node(node, key: Any, strict: bool = False):
+    best = None
+    while node is not None:
+        if key < node.key or (not strict and node.key == key):
+            best = node
+            node = node.left
+        else:
+            node = node.right
+    return best
+
+def _subtree_size(node) -> int:
+    return node.size if node is not None else 0
+
+def _node_height(node) -> int:
+    return node.height if node is not None else 0
+
+def _rank(node, key: Any, inclusive: bool = False) -> int:
+    # Number of keys below `key` (or at-or-below it when inclusive)
+    rank = 0
+    while node is not None:
+        if node.key < key or (inclusive and node.key == key):
+            rank += _subtree_size(node.left) + 1
+            node = node.right
+        else:
+            node = node.left
+    return rank
+
+def _select_node(node, index: int):
+    while node is not None:
+        left_size = _subtree_size(node.left)
+        if index < left_size:
+            node = node.left
+        elif index == left_size:
+            return node
+        else:
+            index -= left_size + 1
+            node = node.right
+    return None
+
+def _iter_from_rank(node, index: int) -> Iterator[Any]:
+    # Inorder iteration starting at the index-th smallest key, seeded by one root-to-node descent
+    stack = []
+    while node is not None:
+        left_size = _subtree_size(node.left)
+        if index < left_size:
+            stack.append(node)
+            node = node.left
+        elif index == left_size:
+            stack.append(node)
+            break
+        else:
+            index -= left_size + 1
+            node = node.right
+    while stack:
+        node = stack.pop()
+        yield node.value
+        node = node.right
+        while node is not None:
+            stack.append(node)
+            node = node.left
+
+def _agg_add(a: Optional[Tuple], b: Optional[Tuple]) -> Optional[Tuple]:
+    # Aggregates are tuples of numbers summed element-wise; None is the empty aggregate
+    if a is None: return b
+    if b is None: return a
+    return tuple(x + y for x, y in zip(a, b))
+
+def _unique_sorted(pairs: Iterable[Tuple[Any, Any]]) -> Tuple[List[Any], List[Any]]:
+    # Split (key, value) pairs that are sorted by key into parallel lists, keeping the first of equal keys
+    keys, values = [], []
+    for key, value in pairs:
+        if keys:
+            if key == keys[-1]: continue
+            if key < keys[-1]: raise ValueError("values must be sorted by key")
+        keys.append(key)
+        values.append(value)
+    return keys, values
+
+def _bulk_insert(tree, values: Iterable[Any]) -> int:
+    # Sort the batch once; small batches go through insert(), large ones are merged with the
+    # existing contents (existing entries win on equal keys) and rebuilt in a single linear pass
+    before = tree._size
+    new_pairs = sorted(((tree._key_of(v), v) for v in values), key=lambda pair: pair[0])
+    if len(new_pairs) * max(1, before.bit_length()) < before:
+        return sum(1 for key, value in new_pairs if tree.insert(value))
+    old_pairs = ((tree._key_of(v), v) for v in tree.iter_inorder())
+    tree._build(*_unique_sorted(merge(old_pairs, new_pairs, key=lambda pair: pair[0])))
+    return tree._size - before
+
+class TreeStats(NamedTuple):
+    size: int
+    height: int
+    min: Any
+    max: Any
+    average_depth: float
+    leaf_count: int
+
+class _LinkedTree(TreeInterface):
+    """Shared plumbing for the pointer-based binary search trees. Subclasses keep
+    `root`, `_size` and `_key`; their nodes carry key, value, left, right and a
+    subtree `size`, which is all the module-level walkers above rely on."""
+    
+    _stats: Optional[TreeStats] = None  # Cleared by every mutation
+    
+    def stats(self) -> TreeStats:
+        # One level-by-level walk, then served from cache until the tree changes
+        if self._stats is None:
+            depth_total = leaves = 0
+            depth, level = 0, [self.root] if self.root else []
+            while level:
+                depth += 1
+                depth_total += depth * len(level)
+                leaves += sum(1 for n in level if n.left is None and n.right is None)
+                level = [child for n in level for child in (n.left, n.right) if child]
+            self._stats = TreeStats(self._size, self.get_height(), self.find_min(), self.find_max(),
+                                    depth_total / self._size if self._size else 0.0, leaves)
+        return self._stats
+    
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
+    
+    def _lookup(self, key: Any):
+        node = self.root
+        while node is not None:
+            if key == node.key: return node
+            node = node.left if key < node.key else node.right
+        return None
+    
+    def search(self, value: Any) -> bool:
+        return self._lookup(self._key_of(value)) is not None
+    
+    def get(self, key: Any) -> Any:
+        node = self._lookup(key)
+        return node.value if node else None
+    
+    def contains_key(self, key: Any) -> bool:
+        return self._lookup(key) is not None
+    
+    def delete(self, value: Any) -> bool:
+        return self.delete_key(self._key_of(value))
+    
+    def replace(self, value: Any) -> bool:
+        # Same key, so the node keeps its place and only the value changes
+        node = self._lookup(self._key_of(value))
+        if node is None: return False
+        node.value = value
+        self._stats = None
+        return True
+    
+    def get_height(self) -> int:
+        # Level-by-level sweep; no recursion, so degenerate trees are fine
+        height = 0
+        level = [self.root] if self.root else []
+        while level:
+            height += 1
+            level = [child for n in level for child in (n.left, n.right) if child]
+        return height
+    
+    def get_size(self) -> int: return self._size
+    
+    def bytes_per_node(self) -> float:
+        # Nodes are fixed-size __slots__ objects, so one node's footprint is representative
+        return float(sys.getsizeof(self.root)) if self.root else 0.0
+    
+    def traverse_inorder(self) -> List[Any]:
+        return list(_iter_inorder(self.root))
+    
+    def traverse_preorder(self) -> List[Any]:
+        return list(_iter_preorder(self.root))
+    
+    def traverse_postorder(self) -> List[Any]:
+        return list(_iter_postorder(self.root))
+    
+    # Lazy traversals: O(height) stack, so callers that stop early pay only for what they consume
+    def iter_inorder(self) -> Iterator[Any]: return _iter_inorder(self.root)
+    def iter_preorder(self) -> Iterator[Any]: return _iter_preorder(self.root)
+    def iter_postorder(self) -> Iterator[Any]: return _iter_postorder(self.root)
+    def iter_levelorder(self) -> Iterator[Any]: return _iter_levelorder(self.root)
+    def __reversed__(self) -> Iterator[Any]: return _iter_reverse_inorder(self.root)
+    
+    # Ordered navigation by key: O(log n + k) for ranges, O(height) for the rest
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        return _iter_range(self.root, lo, hi, inclusive)
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        upper = self._size if hi is None else _rank(self.root, hi, inclusive=hi_inc)
+        lower = 0 if lo is None else _rank(self.root, lo, inclusive=not lo_inc)
+        return max(0, upper - lower)
+    
+    def floor(self, key: Any) -> Any:
+        node = _floor_node(self.root, key)
+        return node.value if node else None
+    
+    def ceiling(self, key: Any) -> Any:
+        node = _ceiling_node(self.root, key)
+        return node.value if node else None
+    
+    def successor(self, key: Any) -> Any:
+        node = _ceiling_node(self.root, key, strict=True)
+        return node.value if node else None
+    
+    def predecessor(self, key: Any) -> Any:
+        node = _floor_node(self.root, key, strict=True)
+        return node.value if node else None
+    
+    # Order statistics from subtree sizes: O(height) each, slice adds O(limit)
+    def select(self, index: int) -> Any:
+        node = _select_node(self.root, index) if 0 <= index < self._size else None
+        return node.value if node else None
+    
+    def rank(self, key: Any) -> int:
+        return _rank(self.root, key)
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        if offset < 0 or offset >= self._size or limit <= 0: return []
+        return list(islice(_iter_from_rank(self.root, offset), limit))
+    
+    def find_min(self) -> Any:
+        if self.root is None: return None
+        current = self.root
+        while current.left: current = current.left
+        return current.value
+    
+    def find_max(self) -> Any:
+        if self.root is None: return None
+        current = self.root
+        while current.right: current = current.right
+        return current.value
+
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        return _bulk_insert(self, values)
+    
+    def check_invariants(self) -> List[str]:
+        # Key order, subtree sizes and _size, plus each subclass's balance rule via
+        # _check_node; returns the violations found, empty when the tree is sound
+        problems = []
+        previous = None
+        count = 0
+        stack, node = [], self.root
+        while stack or node is not None:
+            while node is not None:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            if count and not previous.key < node.key:
+                problems.append(f"order: {previous.key!r} before {node.key!r}")
+            if node.size != 1 + _subtree_size(node.left) + _subtree_size(node.right):
+                problems.append(f"size: node {node.key!r} records {node.size}")
+            problem = self._check_node(node)
+            if problem:
+                problems.append(problem)
+            previous, count = node, count + 1
+            node = node.right
+        if count != self._size:
+            problems.append(f"_size is {self._size} but the tree holds {count} nodes")
+        return problems
+    
+    def _check_node(self, node) -> Optional[str]:
+        return None
 
 class BSTNode:
-    def __init__(self, value: Any):
+    __slots__ = ('value', 'key', 'left', 'right', 'parent', 'size', 'height')
+    
+    def __init__(self, value: Any, key: Any = None):
         self.value = value
+        self.key = value if key is None else key
         self.left: Optional['BSTNode'] = None
         self.right: Optional['BSTNode'] = None
         self.parent: Optional['BSTNode'] = None
+        self.size = 1  # Nodes in this subtree, for rank/select
+        self.height = 1
 
-class BinarySearchTree(TreeInterface):
-    def __init__(self):
+class BinarySearchTree(_LinkedTree):
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None):
         self.root: Optional[BSTNode] = None
         self._size = 0
-        
+        self._key = key  # Extracts the ordering key from a stored value; None orders by value
+    
+    def _check_node(self, node: BSTNode) -> Optional[str]:
+        if node.height != 1 + max(_node_height(node.left), _node_height(node.right)):
+            return f"height: node {node.key!r} records {node.height}"
+        return None
+    
     def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
         if self.root is None:
-            self.root = BSTNode(value)
+            self.root = BSTNode(value, key)
             self._size += 1
+            self._stats = None
             return True
-        return self._insert_recursive(self.root, value)
-    
-    def _insert_recursive(self, node: BSTNode, value: Any) -> bool:
-        if value == node.value:
-            return False
-        if value < node.value:
-            if node.left is None:
-                node.left = BSTNode(value)
-                node.left.parent = node
-                self._size += 1
-                return True
-            return self._insert_recursive(node.left, value)
-        else:
-            if node.right is None:
-                node.right = BSTNode(value)
-                node.right.parent = node
-                self._size += 1
-                return True
-            return self._insert_recursive(node.right, value)
-    
-    def search(self, value: Any) -> bool:
-        return self._search_recursive(self.root, value)
-    
-    def _search_recursive(self, node: Optional[BSTNode], value: Any) -> bool:
-        if node is None: return False
-        if value == node.value: return True
-        return (self._search_recursive(node.left, value) if value < node.value 
-                else self._search_recursive(node.right, value))
+        node = self.root
+        while True:
+            if key == node.key:
+                return False
+            if key < node.key:
+                if node.left is None:
+                    node.left = BSTNode(value, key)
+                    node.left.parent = node
+                    break
+                node = node.left
+            else:
+                if node.right is None:
+                    node.right = BSTNode(value, key)
+                    node.right.parent = node
+                    break
+                node = node.right
+        while node is not None:
+            node.size += 1
+            node.height = 1 + max(_node_height(node.left), _node_height(node.right))
+            node = node.parent
+        self._size += 1
+        self._stats = None
+        return True
     
-    def delete(self, value: Any) -> bool:
-        node_to_delete = self._find_node(self.root, value)
+    def delete_key(self, key: Any) -> bool:
+        node_to_delete = self._find_node(self.root, key)
         if node_to_delete is None: return False
         self._delete_node(node_to_delete)
         self._size -= 1
+        self._stats = None
         return True
     
-    def _find_node(self, node: Optional[BSTNode], value: Any) -> Optional[BSTNode]:
-        if node is None: return None
-        if value == node.value: return node
-        return (self._find_node(node.left, value) if value < node.value 
-                else self._find_node(node.right, value))
+    def _find_node(self, node: Optional[BSTNode], key: Any) -> Optional[BSTNode]:
+        while node is not None:
+            if key == node.key: return node
+            node = node.left if key < node.key else node.right
+        return None
     
     def _delete_node(self, node: BSTNode):
         if node.left is None and node.right is None:
+            changed = node.parent
             self._transplant(node, None)
         elif node.left is None:
+            changed = node.parent
             self._transplant(node, node.right)
         elif node.right is None:
+            changed = node.parent
             self._transplant(node, node.left)
         else:
             successor = self._find_min_node(node.right)
+            changed = successor
             if successor.parent != node:
+                changed = successor.parent
                 self._transplant(successor, successor.right)
                 successor.right = node.right
                 successor.right.parent = successor
             self._transplant(node, successor)
             successor.left = node.left
             successor.left.parent = successor
+        self._refresh_upwards(changed)
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) -> 'BinarySearchTree':
+        # Perfectly balanced tree from key-sorted input in O(n), no per-value descent
+        tree = cls(key=key)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        def build(lo: int, hi: int, parent: Optional[BSTNode]) -> Optional[BSTNode]:
+            if lo > hi: return None
+            mid = (lo + hi) // 2
+            node = BSTNode(values[mid], keys[mid])
+            node.parent = parent
+            node.left = build(lo, mid - 1, node)
+            node.right = build(mid + 1, hi, node)
+            node.size = hi - lo + 1
+            node.height = 1 + max(_node_height(node.left), _node_height(node.right))
+            return node
+        self.root = build(0, len(keys) - 1, None)  # Recursion depth is only log2(n)
+        self._size = len(keys)
+        self._stats = None
+    
+    def _refresh_upwards(self, node: Optional[BSTNode]):
+        # Recompute subtree sizes and heights from the lowest modified node up to the root
+        while node is not None:
+            node.size = 1 + _subtree_size(node.left) + _subtree_size(node.right)
+            node.height = 1 + max(_node_height(node.left), _node_height(node.right))
+            node = node.parent
+    
+    def get_height(self) -> int:
+        return self.root.height if self.root else 0
     
     def _transplant(self, u: BSTNode, v: Optional[BSTNode]):
         if u.parent is None: self.root = v
@@ -125,220 +577,2646 @@ class BinarySearchTree(TreeInterface):
         while node.left: node = node.left
         return node
     
+class AVLNode:
+    __slots__ = ('value', 'key', 'left', 'right', 'height', 'size', 'agg')
+    
+    def __init__(self, value: Any, key: Any = None):
+        self.value = value
+        self.key = value if key is None else key
+        self.left: Optional['AVLNode'] = None
+        self.right: Optional['AVLNode'] = None
+        self.height = 1
+        self.size = 1  # Nodes in this subtree, for rank/select
+        self.agg: Optional[Tuple] = None  # Subtree sum of the tree's aggregate function, if any
+
+class AVLTree(_LinkedTree):
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None,
+                 aggregate: Optional[Callable[[Any], Tuple]] = None):
+        self.root: Optional[AVLNode] = None
+        self._size = 0
+        self._key = key  # Extracts the ordering key from a stored value; None orders by value
+        self._aggregate = aggregate  # Maps a value to a tuple of numbers summed per subtree
+    
+    def _check_node(self, node: AVLNode) -> Optional[str]:
+        left, right = _node_height(node.left), _node_height(node.right)
+        if node.height != 1 + max(left, right):
+            return f"height: node {node.key!r} records {node.height}"
+        if abs(left - right) > 1:
+            return f"balance: node {node.key!r} has balance {left - right}"
+        return None
+    
+    def _new_node(self, value: Any, key: Any) -> AVLNode:
+        node = AVLNode(value, key)
+        if self._aggregate is not None: node.agg = self._aggregate(value)
+        return node
+        
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        if self.root is None:
+            self.root = self._new_node(value, key)
+            self._size += 1
+            self._stats = None
+            return True
+        path = []
+        node = self.root
+        while node is not None:
+            if key == node.key: return False
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        parent = path[-1]
+        if key < parent.key: parent.left = self._new_node(value, key)
+        else: parent.right = self._new_node(value, key)
+        self._size += 1
+        self._stats = None
+        self._rebalance_path(path, 1)
+        return True
+    
+    def _rebalance_path(self, path: List[AVLNode], delta: int):
+        # Walk the search path bottom-up, fixing heights/sizes and relinking rotated subtrees
+        for i in range(len(path) - 1, -1, -1):
+            node = path[i]
+            old_height = node.height
+            self._update_node(node)
+            balanced = self._balance_node(node)
+            if balanced is node:
+                if node.height == old_height and self._aggregate is None:
+                    # Shape above is unaffected; only the subtree counts still change
+                    for ancestor in path[:i]: ancestor.size += delta
+                    break
+                continue
+            if i == 0: self.root = balanced
+            elif path[i - 1].left is node: path[i - 1].left = balanced
+            else: path[i - 1].right = balanced
+    
+    def _update_node(self, node: AVLNode):
+        left_h = node.left.height if node.left else 0
+        right_h = node.right.height if node.right else 0
+        node.height = 1 + max(left_h, right_h)
+        node.size = 1 + _subtree_size(node.left) + _subtree_size(node.right)
+        if self._aggregate is not None:
+            node.agg = _agg_add(self._aggregate(node.value),
+                                _agg_add(node.left.agg if node.left else None,
+                                         node.right.agg if node.right else None))
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None,
+                    aggregate: Optional[Callable[[Any], Tuple]] = None) -> 'AVLTree':
+        # Perfectly balanced tree from key-sorted input in O(n), no descents or rotations
+        tree = cls(key=key, aggregate=aggregate)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        def build(lo: int, hi: int) -> Optional[AVLNode]:
+            if lo > hi: return None
+            mid = (lo + hi) // 2
+            node = AVLNode(values[mid], keys[mid])
+            node.left = build(lo, mid - 1)
+            node.right = build(mid + 1, hi)
+            self._update_node(node)
+            return node
+        self.root = build(0, len(keys) - 1)  # Recursion depth is only log2(n)
+        self._size = len(keys)
+        self._stats = None
+    
+    def refresh(self, key: Any) -> bool:
+        # Recompute aggregates after the value stored under `key` was changed in place
+        path = []
+        node = self.root
+        while node is not None:
+            path.append(node)
+            if key == node.key: break
+            node = node.left if key < node.key else node.right
+        if node is None: return False
+        for node in reversed(path): self._update_node(node)
+        return True
+    
+    def replace(self, value: Any) -> bool:
+        return super().replace(value) and (self._aggregate is None or self.refresh(self._key_of(value)))
+    
+    def aggregate_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Optional[Tuple]:
+        # Sum of the aggregate over keys in [lo, hi] in O(log n): whole subtrees hanging
+        # off the two boundary paths are added from their cached sums
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        def above_lo(node): return lo is None or lo < node.key or (lo_inc and lo == node.key)
+        def below_hi(node): return hi is None or node.key < hi or (hi_inc and hi == node.key)
+        own = self._aggregate
+        node = self.root
+        while node is not None and not (above_lo(node) and below_hi(node)):
+            node = node.right if not above_lo(node) else node.left
+        if node is None or own is None: return None
+        total = own(node.value)
+        branch = node.left
+        while branch is not None:
+            if above_lo(branch):
+                total = _agg_add(total, _agg_add(own(branch.value), branch.right.agg if branch.right else None))
+                branch = branch.left
+            else:
+                branch = branch.right
+        branch = node.right
+        while branch is not None:
+            if below_hi(branch):
+                total = _agg_add(total, _agg_add(own(branch.value), branch.left.agg if branch.left else None))
+                branch = branch.right
+            else:
+                branch = branch.left
+        return total
+    
+    def _balance_node(self, node: AVLNode) -> AVLNode:
+        balance = self._get_balance(node)
+        if balance > 1:
+            if self._get_balance(node.left) < 0:
+                node.left = self._rotate_left(node.left)
+            return self._rotate_right(node)
+        if balance < -1:
+            if self._get_balance(node.right) > 0:
+                node.right = self._rotate_right(node.right)
+            return self._rotate_left(node)
+        return node
+    
+    def _get_balance(self, node: AVLNode) -> int:
+        left_h = node.left.height if node.left else 0
+        right_h = node.right.height if node.right else 0
+        return left_h - right_h
+    
+    def _rotate_left(self, z: AVLNode) -> AVLNode:
+        y = z.right
+        T2 = y.left
+        y.left = z
+        z.right = T2
+        self._update_node(z)
+        self._update_node(y)
+        return y
+    
+    def _rotate_right(self, z: AVLNode) -> AVLNode:
+        y = z.left
+        T3 = y.right
+        y.right = z
+        z.left = T3
+        self._update_node(z)
+        self._update_node(y)
+        return y
+    
+    def delete_key(self, key: Any) -> bool:
+        path = []
+        node = self.root
+        while node is not None and key != node.key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None: return False
+        if node.left is not None and node.right is not None:
+            # Two children: pull the inorder successor's value up and unlink the successor instead
+            path.append(node)
+            successor = node.right
+            while successor.left is not None:
+                path.append(successor)
+                successor = successor.left
+            node.value, node.key = successor.value, successor.key
+            node = successor
+        child = node.left if node.left is not None else node.right
+        if not path: self.root = child
+        elif path[-1].left is node: path[-1].left = child
+        else: path[-1].right = child
+        self._size -= 1
+        self._stats = None
+        self._rebalance_path(path, -1)
+        return True
+    
+    def _find_min_node(self, node: AVLNode) -> AVLNode:
+        while node.left: node = node.left
+        return node
+    
     def get_height(self) -> int:
-        return self._calculate_height(self.root)
+        return self.root.height if self.root else 0
+
+class PersistentAVLTree(AVLTree):
+    """AVL tree whose nodes are never changed once built. An update copies the O(log n)
+    nodes on its search path, rebalancing as it goes, and shares every other subtree
+    with the previous version, so snapshot() is O(1) and a snapshot stays consistent
+    with no locking however the tree changes afterwards.
     
-    def _calculate_height(self, node: Optional[BSTNode]) -> int:
-        if node is None: return 0
-        return 1 + max(self._calculate_height(node.left), 
-                      self._calculate_height(node.right))
+    The root and size are published together as one (root, size) tuple replaced in a
+    single assignment, so a lock-free reader never pairs a new root with an old size."""
     
-    def get_size(self) -> int: return self._size
+    _stats_cache: Optional[Tuple[Tuple[Optional[AVLNode], int], TreeStats]] = None
     
-    def traverse_inorder(self) -> List[Any]:
-        result = []; self._inorder_recursive(self.root, result); return result
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None,
+                 aggregate: Optional[Callable[[Any], Tuple]] = None):
+        self._key = key
+        self._aggregate = aggregate
+        self._state: Tuple[Optional[AVLNode], int] = (None, 0)
     
-    def _inorder_recursive(self, node: Optional[BSTNode], result: List[Any]):
-        if node:
-            self._inorder_recursive(node.left, result)
-            result.append(node.value)
-            self._inorder_recursive(node.right, result)
+    @property
+    def root(self) -> Optional[AVLNode]: return self._state[0]
     
-    def traverse_preorder(self) -> List[Any]:
-        result = []; self._preorder_recursive(self.root, result); return result
+    @property
+    def _size(self) -> int: return self._state[1]
     
-    def _preorder_recursive(self, node: Optional[BSTNode], result: List[Any]):
-        if node:
-            result.append(node.value)
-            self._preorder_recursive(node.left, result)
-            self._preorder_recursive(node.right, result)
+    def snapshot(self) -> 'PersistentAVLTree':
+        version = object.__new__(type(self))
+        version._key = self._key
+        version._aggregate = self._aggregate
+        version._state = self._state
+        return version
     
-    def traverse_postorder(self) -> List[Any]:
-        result = []; self._postorder_recursive(self.root, result); return result
+    def stats(self) -> TreeStats:
+        # Cached against the state it was computed from, so a reader that finishes after a
+        # write can never leave stale figures behind for the new version
+        state = self._state
+        cached = self._stats_cache
+        if cached is None or cached[0] is not state:
+            version = self.snapshot()
+            cached = self._stats_cache = (state, _LinkedTree.stats(version))
+        return cached[1]
     
-    def _postorder_recursive(self, node: Optional[BSTNode], result: List[Any]):
-        if node:
-            self._postorder_recursive(node.left, result)
-            self._postorder_recursive(node.right, result)
-            result.append(node.value)
+    def inserted(self, value: Any) -> 'PersistentAVLTree':
+        # Functional update: a new version with `value`, this one unchanged
+        version = self.snapshot()
+        version.insert(value)
+        return version
     
-    def find_min(self) -> Any:
-        if self.root is None: return None
-        current = self.root
-        while current.left: current = current.left
-        return current.value
+    def without(self, key: Any) -> 'PersistentAVLTree':
+        version = self.snapshot()
+        version.delete_key(key)
+        return version
     
-    def find_max(self) -> Any:
-        if self.root is None: return None
-        current = self.root
-        while current.right: current = current.right
-        return current.value
+    def _node(self, value: Any, key: Any, left: Optional[AVLNode], right: Optional[AVLNode]) -> AVLNode:
+        node = AVLNode(value, key)
+        node.left, node.right = left, right
+        self._update_node(node)
+        return node
+    
+    def _join(self, value: Any, key: Any, left: Optional[AVLNode], right: Optional[AVLNode]) -> AVLNode:
+        # New node over two shared subtrees; a height gap of two is closed with new rotated nodes
+        left_h, right_h = _node_height(left), _node_height(right)
+        if left_h > right_h + 1:
+            if _node_height(left.left) >= _node_height(left.right):
+                return self._node(left.value, left.key, left.left, self._node(value, key, left.right, right))
+            pivot = left.right
+            return self._node(pivot.value, pivot.key, self._node(left.value, left.key, left.left, pivot.left),
+                              self._node(value, key, pivot.right, right))
+        if right_h > left_h + 1:
+            if _node_height(right.right) >= _node_height(right.left):
+                return self._node(right.value, right.key, self._node(value, key, left, right.left), right.right)
+            pivot = right.left
+            return self._node(pivot.value, pivot.key, self._node(value, key, left, pivot.left),
+                              self._node(right.value, right.key, pivot.right, right.right))
+        return self._node(value, key, left, right)
+    
+    def _rebuild(self, path: List[AVLNode], key: Any, child: Optional[AVLNode]) -> Optional[AVLNode]:
+        # Copy the search path for `key` bottom-up over the replacement `child`
+        for node in reversed(path):
+            if key < node.key:
+                child = self._join(node.value, node.key, child, node.right)
+            else:
+                child = self._join(node.value, node.key, node.left, child)
+        return child
+    
+    def _search_path(self, key: Any) -> Tuple[List[AVLNode], Optional[AVLNode]]:
+        path = []
+        node = self.root
+        while node is not None and key != node.key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        return path, node
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Built off to the side by the in-place AVL builder, then published in one step
+        staging = AVLTree(key=self._key, aggregate=self._aggregate)
+        staging._build(keys, values)
+        self._state = (staging.root, staging._size)
+    
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        path, node = self._search_path(key)
+        if node is not None: return False
+        self._state = (self._rebuild(path, key, self._node(value, key, None, None)), self._size + 1)
+        return True
+    
+    def delete_key(self, key: Any) -> bool:
+        path, node = self._search_path(key)
+        if node is None: return False
+        if node.left is None or node.right is None:
+            child = node.left if node.left is not None else node.right
+        else:
+            # Two children: the right subtree loses its minimum, which takes the node's place
+            successor_path, successor = [], node.right
+            while successor.left is not None:
+                successor_path.append(successor)
+                successor = successor.left
+            right = self._rebuild(successor_path, successor.key, successor.right)
+            child = self._join(successor.value, successor.key, node.left, right)
+        self._state = (self._rebuild(path, key, child), self._size - 1)
+        return True
+    
+    def replace(self, value: Any) -> bool:
+        # Store `value` under its existing key in a new version of the path
+        key = self._key_of(value)
+        path, node = self._search_path(key)
+        if node is None: return False
+        self._state = (self._rebuild(path, key, self._node(value, key, node.left, node.right)), self._size)
+        return True
+    
+    def refresh(self, key: Any) -> bool:
+        # Nodes are shared between versions, so aggregates are recomputed on a copied path
+        node = self._lookup(key)
+        return node is not None and self.replace(node.value)
 
-class AVLNode:
-    def __init__(self, value: Any):
+class RBNode:
+    __slots__ = ('value', 'key', 'left', 'right', 'parent', 'size', 'red')
+    
+    def __init__(self, value: Any, key: Any = None):
         self.value = value
-        self.left: Optional['AVLNode'] = None
-        self.right: Optional['AVLNode'] = None
-        self.height = 1
+        self.key = value if key is None else key
+        self.left: Optional['RBNode'] = None
+        self.right: Optional['RBNode'] = None
+        self.parent: Optional['RBNode'] = None
+        self.size = 1  # Nodes in this subtree, for rank/select
+        self.red = True
 
-class AVLTree(TreeInterface):
-    def __init__(self):
-        self.root: Optional[AVLNode] = None
+def _is_red(node: Optional[RBNode]) -> bool:
+    return node is not None and node.red
+
+class RedBlackTree(_LinkedTree):
+    """Red-black tree: looser balance than AVL (height <= 2 log n) but at most
+    two rotations per insert and three per delete, so writes rebalance cheaply."""
+    
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None):
+        self.root: Optional[RBNode] = None
         self._size = 0
-        
+        self._key = key
+    
+    def _check_node(self, node: RBNode) -> Optional[str]:
+        if node.red and (_is_red(node.left) or _is_red(node.right)):
+            return f"color: red node {node.key!r} has a red child"
+        return None
+    
+    def check_invariants(self) -> List[str]:
+        problems = super().check_invariants()
+        if _is_red(self.root):
+            problems.append("color: root is red")
+        # Every root-to-leaf path crosses the same number of black nodes
+        black_heights = set()
+        stack = [(self.root, 0)]
+        while stack:
+            node, blacks = stack.pop()
+            if node is None:
+                black_heights.add(blacks)
+                continue
+            blacks += not node.red
+            stack.append((node.left, blacks))
+            stack.append((node.right, blacks))
+        if len(black_heights) > 1:
+            problems.append(f"color: black heights differ {sorted(black_heights)}")
+        return problems
+    
+    def _rotate_left(self, x: RBNode):
+        y = x.right
+        x.right = y.left
+        if y.left is not None: y.left.parent = x
+        self._replace(x, y)
+        y.left = x
+        x.parent = y
+        y.size = x.size
+        x.size = 1 + _subtree_size(x.left) + _subtree_size(x.right)
+    
+    def _rotate_right(self, x: RBNode):
+        y = x.left
+        x.left = y.right
+        if y.right is not None: y.right.parent = x
+        self._replace(x, y)
+        y.right = x
+        x.parent = y
+        y.size = x.size
+        x.size = 1 + _subtree_size(x.left) + _subtree_size(x.right)
+    
+    def _replace(self, u: RBNode, v: Optional[RBNode]):
+        # Put v where u hangs from its parent (or at the root)
+        if u.parent is None: self.root = v
+        elif u is u.parent.left: u.parent.left = v
+        else: u.parent.right = v
+        if v is not None: v.parent = u.parent
+    
     def insert(self, value: Any) -> bool:
-        if self.root is None:
-            self.root = AVLNode(value)
-            self._size += 1
-            return True
-        self.root, inserted = self._insert_recursive(self.root, value)
-        if inserted: self._size += 1
-        return inserted
-    
-    def _insert_recursive(self, node: AVLNode, value: Any) -> Tuple[AVLNode, bool]:
-        if value == node.value: return node, False
-        if value < node.value:
-            if node.left is None:
-                node.left = AVLNode(value)
+        key = self._key_of(value)
+        parent, node = None, self.root
+        while node is not None:
+            if key == node.key: return False
+            parent = node
+            node = node.left if key < node.key else node.right
+        node = RBNode(value, key)
+        node.parent = parent
+        if parent is None: self.root = node
+        elif key < parent.key: parent.left = node
+        else: parent.right = node
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += 1
+            ancestor = ancestor.parent
+        self._size += 1
+        self._stats = None
+        self._insert_fixup(node)
+        return True
+    
+    def _insert_fixup(self, node: RBNode):
+        while _is_red(node.parent):
+            parent = node.parent
+            grand = parent.parent
+            if parent is grand.left:
+                uncle = grand.right
+                if _is_red(uncle):
+                    parent.red = uncle.red = False
+                    grand.red = True
+                    node = grand
+                    continue
+                if node is parent.right:
+                    node = parent
+                    self._rotate_left(node)
+                    parent = node.parent
+                parent.red, grand.red = False, True
+                self._rotate_right(grand)
             else:
-                node.left, inserted = self._insert_recursive(node.left, value)
-                if not inserted: return node, False
+                uncle = grand.left
+                if _is_red(uncle):
+                    parent.red = uncle.red = False
+                    grand.red = True
+                    node = grand
+                    continue
+                if node is parent.left:
+                    node = parent
+                    self._rotate_right(node)
+                    parent = node.parent
+                parent.red, grand.red = False, True
+                self._rotate_left(grand)
+        self.root.red = False
+    
+    def delete_key(self, key: Any) -> bool:
+        node = self._lookup(key)
+        if node is None: return False
+        removed_red = node.red
+        if node.left is None or node.right is None:
+            child = node.left if node.left is not None else node.right
+            child_parent = node.parent
+            self._replace(node, child)
         else:
-            if node.right is None:
-                node.right = AVLNode(value)
+            successor = node.right
+            while successor.left is not None: successor = successor.left
+            removed_red = successor.red
+            child = successor.right
+            if successor.parent is node:
+                child_parent = successor
             else:
-                node.right, inserted = self._insert_recursive(node.right, value)
-                if not inserted: return node, False
-        self._update_height(node)
-        return self._balance_node(node), True
+                child_parent = successor.parent
+                self._replace(successor, child)
+                successor.right = node.right
+                successor.right.parent = successor
+            self._replace(node, successor)
+            successor.left = node.left
+            successor.left.parent = successor
+            successor.red = node.red
+        ancestor = child_parent
+        while ancestor is not None:
+            ancestor.size = 1 + _subtree_size(ancestor.left) + _subtree_size(ancestor.right)
+            ancestor = ancestor.parent
+        self._size -= 1
+        self._stats = None
+        if not removed_red: self._delete_fixup(child, child_parent)
+        return True
+    
+    def _delete_fixup(self, node: Optional[RBNode], parent: Optional[RBNode]):
+        # `node` carries an extra black; parent is tracked explicitly because node may be None
+        while node is not self.root and not _is_red(node):
+            if node is parent.left:
+                sibling = parent.right
+                if _is_red(sibling):
+                    sibling.red, parent.red = False, True
+                    self._rotate_left(parent)
+                    sibling = parent.right
+                if not _is_red(sibling.left) and not _is_red(sibling.right):
+                    sibling.red = True
+                    node, parent = parent, parent.parent
+                    continue
+                if not _is_red(sibling.right):
+                    sibling.left.red, sibling.red = False, True
+                    self._rotate_right(sibling)
+                    sibling = parent.right
+                sibling.red, parent.red = parent.red, False
+                sibling.right.red = False
+                self._rotate_left(parent)
+            else:
+                sibling = parent.left
+                if _is_red(sibling):
+                    sibling.red, parent.red = False, True
+                    self._rotate_right(parent)
+                    sibling = parent.left
+                if not _is_red(sibling.left) and not _is_red(sibling.right):
+                    sibling.red = True
+                    node, parent = parent, parent.parent
+                    continue
+                if not _is_red(sibling.left):
+                    sibling.right.red, sibling.red = False, True
+                    self._rotate_left(sibling)
+                    sibling = parent.left
+                sibling.red, parent.red = parent.red, False
+                sibling.left.red = False
+                self._rotate_right(parent)
+            node = self.root
+        if node is not None: node.red = False
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) -> 'RedBlackTree':
+        tree = cls(key=key)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Balanced build: every level but the deepest is full, so colouring only the
+        # deepest level red gives equal black heights on every path
+        deepest = len(keys).bit_length()
+        def build(lo: int, hi: int, parent: Optional[RBNode], depth: int) -> Optional[RBNode]:
+            if lo > hi: return None
+            mid = (lo + hi) // 2
+            node = RBNode(values[mid], keys[mid])
+            node.parent = parent
+            node.red = depth == deepest and depth > 1
+            node.left = build(lo, mid - 1, node, depth + 1)
+            node.right = build(mid + 1, hi, node, depth + 1)
+            node.size = hi - lo + 1
+            return node
+        self.root = build(0, len(keys) - 1, None, 1)  # Recursion depth is only log2(n)
+        self._size = len(keys)
+        self._stats = None
+
+class TreapNode:
+    __slots__ = ('value', 'key', 'left', 'right', 'size', 'priority')
+    
+    def __init__(self, value: Any, key: Any = None, priority: Optional[float] = None):
+        self.value = value
+        self.key = value if key is None else key
+        self.left: Optional['TreapNode'] = None
+        self.right: Optional['TreapNode'] = None
+        self.size = 1  # Nodes in this subtree, for rank/select
+        self.priority = random.random() if priority is None else priority
+
+class Treap(_LinkedTree):
+    """Randomized BST kept in max-heap order on random priorities: expected
+    O(log n) depth with an expected O(1) rotations per update."""
+    
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None):
+        self.root: Optional[TreapNode] = None
+        self._size = 0
+        self._key = key
+    
+    def _check_node(self, node: TreapNode) -> Optional[str]:
+        if any(child is not None and child.priority > node.priority for child in (node.left, node.right)):
+            return f"heap: node {node.key!r} has a higher-priority child"
+        return None
+    
+    def _rotate_left(self, z: TreapNode) -> TreapNode:
+        y = z.right
+        z.right = y.left
+        y.left = z
+        y.size = z.size
+        z.size = 1 + _subtree_size(z.left) + _subtree_size(z.right)
+        return y
+    
+    def _rotate_right(self, z: TreapNode) -> TreapNode:
+        y = z.left
+        z.left = y.right
+        y.right = z
+        y.size = z.size
+        z.size = 1 + _subtree_size(z.left) + _subtree_size(z.right)
+        return y
+    
+    def _relink(self, path: List[TreapNode], old: TreapNode, new: TreapNode):
+        if not path: self.root = new
+        elif path[-1].left is old: path[-1].left = new
+        else: path[-1].right = new
+    
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        path = []
+        node = self.root
+        while node is not None:
+            if key == node.key: return False
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        node = TreapNode(value, key)
+        if not path: self.root = node
+        elif key < path[-1].key: path[-1].left = node
+        else: path[-1].right = node
+        for ancestor in path: ancestor.size += 1
+        self._size += 1
+        self._stats = None
+        # Rotate the new node up until its parent outranks it
+        while path and path[-1].priority < node.priority:
+            parent = path.pop()
+            rotated = self._rotate_right(parent) if parent.left is node else self._rotate_left(parent)
+            self._relink(path, parent, rotated)
+        return True
+    
+    def delete_key(self, key: Any) -> bool:
+        path = []
+        node = self.root
+        while node is not None and key != node.key:
+            path.append(node)
+            node = node.left if key < node.key else node.right
+        if node is None: return False
+        # Rotate the node down below its higher-priority child until it has at most one child
+        while node.left is not None and node.right is not None:
+            if node.left.priority > node.right.priority:
+                rotated = self._rotate_right(node)
+            else:
+                rotated = self._rotate_left(node)
+            self._relink(path, node, rotated)
+            path.append(rotated)
+        child = node.left if node.left is not None else node.right
+        self._relink(path, node, child)
+        for ancestor in path: ancestor.size -= 1
+        self._size -= 1
+        self._stats = None
+        return True
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) -> 'Treap':
+        tree = cls(key=key)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Linear-time Cartesian tree construction over random priorities: the right
+        # spine lives on a stack and each node is pushed and popped at most once
+        spine: List[TreapNode] = []
+        for key, value in zip(keys, values):
+            node = TreapNode(value, key)
+            last = None
+            while spine and spine[-1].priority < node.priority:
+                last = spine.pop()
+                last.size = 1 + _subtree_size(last.left) + _subtree_size(last.right)
+            node.left = last
+            if spine: spine[-1].right = node
+            spine.append(node)
+        for node in reversed(spine):
+            node.size = 1 + _subtree_size(node.left) + _subtree_size(node.right)
+        self.root = spine[0] if spine else None
+        self._size = len(keys)
+        self._stats = None
+
+_NIL = -1
+
+class ArrayAVLTree(TreeInterface):
+    """AVL tree stored as a struct of arrays: node i is row i of the int32 columns
+    below, keys/values live in two parallel lists, and deleted rows are recycled
+    through a free list chained via the `right` column."""
+    
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None):
+        self._left = array('i')
+        self._right = array('i')
+        self._parent = array('i')
+        self._height = array('i')
+        self._count = array('i')  # Subtree sizes, for rank/select
+        self._keys: List[Any] = []
+        self._values: List[Any] = []
+        self._root = _NIL
+        self._free = _NIL
+        self._size = 0
+        self._key = key
+    
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
+    
+    def bytes_per_node(self) -> float:
+        # Structural bytes per live node: the int32 columns plus the two reference lists
+        # (the key and value objects themselves are shared with the caller and not counted)
+        columns = (self._left, self._right, self._parent, self._height, self._count)
+        total = sum(col.buffer_info()[1] * col.itemsize for col in columns)
+        total += sys.getsizeof(self._keys) + sys.getsizeof(self._values)
+        return total / self._size if self._size else 0.0
+    
+    def _alloc(self, value: Any, key: Any) -> int:
+        if self._free != _NIL:
+            node = self._free
+            self._free = self._right[node]
+            self._keys[node], self._values[node] = key, value
+            self._left[node] = self._right[node] = self._parent[node] = _NIL
+            self._height[node] = self._count[node] = 1
+            return node
+        for col, init in ((self._left, _NIL), (self._right, _NIL), (self._parent, _NIL),
+                          (self._height, 1), (self._count, 1)):
+            col.append(init)
+        self._keys.append(key)
+        self._values.append(value)
+        return len(self._keys) - 1
+    
+    def _release(self, node: int):
+        self._keys[node] = self._values[node] = None
+        self._right[node] = self._free
+        self._free = node
+    
+    def _h(self, node: int) -> int:
+        return self._height[node] if node != _NIL else 0
+    
+    def _n(self, node: int) -> int:
+        return self._count[node] if node != _NIL else 0
+    
+    def _update(self, node: int):
+        left, right = self._left[node], self._right[node]
+        self._height[node] = 1 + max(self._h(left), self._h(right))
+        self._count[node] = 1 + self._n(left) + self._n(right)
+    
+    def _replace_child(self, parent: int, old: int, new: int):
+        if parent == _NIL: self._root = new
+        elif self._left[parent] == old: self._left[parent] = new
+        else: self._right[parent] = new
+        if new != _NIL: self._parent[new] = parent
+    
+    def _rotate_left(self, z: int) -> int:
+        y = self._right[z]
+        t2 = self._left[y]
+        self._replace_child(self._parent[z], z, y)
+        self._right[z] = t2
+        if t2 != _NIL: self._parent[t2] = z
+        self._left[y] = z
+        self._parent[z] = y
+        self._update(z)
+        self._update(y)
+        return y
+    
+    def _rotate_right(self, z: int) -> int:
+        y = self._left[z]
+        t3 = self._right[y]
+        self._replace_child(self._parent[z], z, y)
+        self._left[z] = t3
+        if t3 != _NIL: self._parent[t3] = z
+        self._right[y] = z
+        self._parent[z] = y
+        self._update(z)
+        self._update(y)
+        return y
+    
+    def _retrace(self, node: int):
+        # Walk parent links to the root, fixing heights/sizes and rotating where unbalanced
+        while node != _NIL:
+            self._update(node)
+            left, right = self._left[node], self._right[node]
+            balance = self._h(left) - self._h(right)
+            if balance > 1:
+                if self._h(self._left[left]) < self._h(self._right[left]):
+                    self._rotate_left(left)
+                node = self._rotate_right(node)
+            elif balance < -1:
+                if self._h(self._left[right]) > self._h(self._right[right]):
+                    self._rotate_right(right)
+                node = self._rotate_left(node)
+            node = self._parent[node]
+    
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        if self._root == _NIL:
+            self._root = self._alloc(value, key)
+            self._size += 1
+            return True
+        keys, node = self._keys, self._root
+        while True:
+            if key == keys[node]: return False
+            child = self._left[node] if key < keys[node] else self._right[node]
+            if child == _NIL: break
+            node = child
+        new = self._alloc(value, key)
+        if key < keys[node]: self._left[node] = new
+        else: self._right[node] = new
+        self._parent[new] = node
+        self._size += 1
+        self._retrace(node)
+        return True
+    
+    def _find(self, key: Any) -> int:
+        keys, node = self._keys, self._root
+        while node != _NIL:
+            if key == keys[node]: return node
+            node = self._left[node] if key < keys[node] else self._right[node]
+        return _NIL
+    
+    def search(self, value: Any) -> bool:
+        return self._find(self._key_of(value)) != _NIL
+    
+    def get(self, key: Any) -> Any:
+        node = self._find(key)
+        return self._values[node] if node != _NIL else None
+    
+    def contains_key(self, key: Any) -> bool:
+        return self._find(key) != _NIL
+    
+    def delete(self, value: Any) -> bool:
+        return self.delete_key(self._key_of(value))
+    
+    def delete_key(self, key: Any) -> bool:
+        node = self._find(key)
+        if node == _NIL: return False
+        if self._left[node] != _NIL and self._right[node] != _NIL:
+            successor = self._right[node]
+            while self._left[successor] != _NIL: successor = self._left[successor]
+            self._keys[node], self._values[node] = self._keys[successor], self._values[successor]
+            node = successor
+        child = self._left[node] if self._left[node] != _NIL else self._right[node]
+        parent = self._parent[node]
+        self._replace_child(parent, node, child)
+        self._release(node)
+        self._size -= 1
+        self._retrace(parent)
+        return True
+    
+    def get_height(self) -> int: return self._h(self._root)
+    
+    def get_size(self) -> int: return self._size
+    
+    def _edge(self, node: int, column: array) -> int:
+        if node == _NIL: return _NIL
+        while column[node] != _NIL: node = column[node]
+        return node
+    
+    def find_min(self) -> Any:
+        node = self._edge(self._root, self._left)
+        return self._values[node] if node != _NIL else None
+    
+    def find_max(self) -> Any:
+        node = self._edge(self._root, self._right)
+        return self._values[node] if node != _NIL else None
+    
+    def _iter_sorted(self, stack: List[int], forward: bool = True) -> Iterator[Any]:
+        # Continue an inorder walk from a stack of pending ancestors
+        near, far = (self._left, self._right) if forward else (self._right, self._left)
+        values = self._values
+        while stack:
+            node = stack.pop()
+            yield values[node]
+            node = far[node]
+            while node != _NIL:
+                stack.append(node)
+                node = near[node]
+    
+    def _spine(self, node: int, column: array) -> List[int]:
+        stack = []
+        while node != _NIL:
+            stack.append(node)
+            node = column[node]
+        return stack
+    
+    def iter_inorder(self) -> Iterator[Any]:
+        return self._iter_sorted(self._spine(self._root, self._left))
+    
+    def __reversed__(self) -> Iterator[Any]:
+        return self._iter_sorted(self._spine(self._root, self._right), forward=False)
+    
+    def iter_preorder(self) -> Iterator[Any]:
+        stack = [self._root] if self._root != _NIL else []
+        while stack:
+            node = stack.pop()
+            yield self._values[node]
+            if self._right[node] != _NIL: stack.append(self._right[node])
+            if self._left[node] != _NIL: stack.append(self._left[node])
+    
+    def iter_postorder(self) -> Iterator[Any]:
+        stack, last, node = [], _NIL, self._root
+        while stack or node != _NIL:
+            while node != _NIL:
+                stack.append(node)
+                node = self._left[node]
+            top = stack[-1]
+            if self._right[top] != _NIL and self._right[top] != last:
+                node = self._right[top]
+            else:
+                yield self._values[top]
+                last = stack.pop()
+    
+    def iter_levelorder(self) -> Iterator[Any]:
+        queue = deque([self._root] if self._root != _NIL else [])
+        while queue:
+            node = queue.popleft()
+            yield self._values[node]
+            if self._left[node] != _NIL: queue.append(self._left[node])
+            if self._right[node] != _NIL: queue.append(self._right[node])
+    
+    def traverse_inorder(self) -> List[Any]: return list(self.iter_inorder())
+    def traverse_preorder(self) -> List[Any]: return list(self.iter_preorder())
+    def traverse_postorder(self) -> List[Any]: return list(self.iter_postorder())
+    
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        keys, stack = self._keys, []
+        def descend(node):
+            while node != _NIL:
+                if lo is None or lo < keys[node] or (lo_inc and lo == keys[node]):
+                    stack.append(node)
+                    node = self._left[node]
+                else:
+                    node = self._right[node]
+        descend(self._root)
+        while stack:
+            node = stack.pop()
+            if hi is not None and (hi < keys[node] or (not hi_inc and hi == keys[node])):
+                return
+            yield self._values[node]
+            descend(self._right[node])
+    
+    def _rank(self, key: Any, inclusive: bool = False) -> int:
+        keys, rank, node = self._keys, 0, self._root
+        while node != _NIL:
+            if keys[node] < key or (inclusive and keys[node] == key):
+                rank += self._n(self._left[node]) + 1
+                node = self._right[node]
+            else:
+                node = self._left[node]
+        return rank
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        upper = self._size if hi is None else self._rank(hi, inclusive=hi_inc)
+        lower = 0 if lo is None else self._rank(lo, inclusive=not lo_inc)
+        return max(0, upper - lower)
+    
+    def _bound(self, key: Any, below: bool, strict: bool) -> Any:
+        # Closest key at/below (floor) or at/above (ceiling) `key`; strict excludes `key` itself
+        keys, best, node = self._keys, _NIL, self._root
+        while node != _NIL:
+            k = keys[node]
+            if k == key and not strict:
+                return self._values[node]
+            if (k < key) if below else (key < k):
+                best = node
+                node = self._right[node] if below else self._left[node]
+            else:
+                node = self._left[node] if below else self._right[node]
+        return self._values[best] if best != _NIL else None
+    
+    def floor(self, key: Any) -> Any: return self._bound(key, below=True, strict=False)
+    def ceiling(self, key: Any) -> Any: return self._bound(key, below=False, strict=False)
+    def successor(self, key: Any) -> Any: return self._bound(key, below=False, strict=True)
+    def predecessor(self, key: Any) -> Any: return self._bound(key, below=True, strict=True)
+    
+    def rank(self, key: Any) -> int:
+        return self._rank(key)
+    
+    def _select(self, index: int, stack: Optional[List[int]] = None) -> int:
+        node = self._root
+        while node != _NIL:
+            left_size = self._n(self._left[node])
+            if index < left_size:
+                if stack is not None: stack.append(node)
+                node = self._left[node]
+            elif index == left_size:
+                if stack is not None: stack.append(node)
+                return node
+            else:
+                index -= left_size + 1
+                node = self._right[node]
+        return _NIL
+    
+    def select(self, index: int) -> Any:
+        node = self._select(index) if 0 <= index < self._size else _NIL
+        return self._values[node] if node != _NIL else None
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        if offset < 0 or offset >= self._size or limit <= 0: return []
+        stack: List[int] = []
+        self._select(offset, stack)
+        return list(islice(self._iter_sorted(stack), limit))
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None) -> 'ArrayAVLTree':
+        tree = cls(key=key)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        return _bulk_insert(self, values)
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Row i holds the i-th smallest key, so the columns are filled in place without a free list
+        n = len(keys)
+        self._keys, self._values = list(keys), list(values)
+        self._left, self._right, self._parent = (array('i', [_NIL]) * n for _ in range(3))
+        self._height, self._count = array('i', [1]) * n, array('i', [1]) * n
+        self._free = _NIL
+        self._size = n
+        def build(lo: int, hi: int, parent: int) -> int:
+            if lo > hi: return _NIL
+            mid = (lo + hi) // 2
+            self._parent[mid] = parent
+            self._left[mid] = build(lo, mid - 1, mid)
+            self._right[mid] = build(mid + 1, hi, mid)
+            self._update(mid)
+            return mid
+        self._root = build(0, n - 1, _NIL)  # Recursion depth is only log2(n)
+
+class _BPlusLeaf:
+    __slots__ = ('keys', 'values', 'next', 'prev')
+    
+    def __init__(self, keys: Optional[List[Any]] = None, values: Optional[List[Any]] = None):
+        self.keys: List[Any] = keys if keys is not None else []
+        self.values: List[Any] = values if values is not None else []
+        self.next: Optional['_BPlusLeaf'] = None
+        self.prev: Optional['_BPlusLeaf'] = None
+
+class _BPlusInternal:
+    __slots__ = ('keys', 'children', 'counts')
+    
+    def __init__(self, keys: List[Any], children: List[Any], counts: List[int]):
+        self.keys = keys  # keys[i] is a lower bound for every key under children[i + 1]
+        self.children = children
+        self.counts = counts  # Values stored under each child, for rank/select
+
+class BPlusTree(TreeInterface):
+    """B+tree with values only in doubly linked leaves. Internal nodes hold at most
+    `order` children and every node except the root stays at least half full.
+    Since values live only in leaves, every traversal order yields them in key order."""
+    
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None, order: int = 64):
+        if order < 3: raise ValueError("order must be at least 3")
+        self.root: Any = _BPlusLeaf()
+        self._size = 0
+        self._key = key
+        self._order = order
+        self._min = (order + 1) // 2
+    
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
+    
+    def _descend(self, key: Any, path: Optional[List[Tuple[_BPlusInternal, int]]] = None) -> _BPlusLeaf:
+        node = self.root
+        while type(node) is _BPlusInternal:
+            i = bisect_right(node.keys, key)
+            if path is not None: path.append((node, i))
+            node = node.children[i]
+        return node
+    
+    def _edge_leaf(self, last: bool) -> _BPlusLeaf:
+        node = self.root
+        while type(node) is _BPlusInternal:
+            node = node.children[-1 if last else 0]
+        return node
+    
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        path: List[Tuple[_BPlusInternal, int]] = []
+        leaf = self._descend(key, path)
+        j = bisect_left(leaf.keys, key)
+        if j < len(leaf.keys) and leaf.keys[j] == key: return False
+        leaf.keys.insert(j, key)
+        leaf.values.insert(j, value)
+        for node, i in path: node.counts[i] += 1
+        self._size += 1
+        if len(leaf.keys) > self._order: self._split(leaf, path)
+        return True
+    
+    def _split(self, node: Any, path: List[Tuple[_BPlusInternal, int]]):
+        # Split an overfull node and push the separator up, splitting ancestors as needed
+        while True:
+            if type(node) is _BPlusLeaf:
+                mid = len(node.keys) // 2
+                right = _BPlusLeaf(node.keys[mid:], node.values[mid:])
+                del node.keys[mid:], node.values[mid:]
+                right.next, right.prev = node.next, node
+                if node.next is not None: node.next.prev = right
+                node.next = right
+                separator = right.keys[0]
+                left_count, right_count = len(node.keys), len(right.keys)
+            else:
+                mid = len(node.keys) // 2
+                separator = node.keys[mid]
+                right = _BPlusInternal(node.keys[mid + 1:], node.children[mid + 1:], node.counts[mid + 1:])
+                del node.keys[mid:], node.children[mid + 1:], node.counts[mid + 1:]
+                left_count, right_count = sum(node.counts), sum(right.counts)
+            if not path:
+                self.root = _BPlusInternal([separator], [node, right], [left_count, right_count])
+                return
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, right)
+            parent.counts[i] = left_count
+            parent.counts.insert(i + 1, right_count)
+            if len(parent.children) <= self._order: return
+            node = parent
+    
+    def _find(self, key: Any) -> Tuple[_BPlusLeaf, int]:
+        leaf = self._descend(key)
+        j = bisect_left(leaf.keys, key)
+        return leaf, (j if j < len(leaf.keys) and leaf.keys[j] == key else -1)
+    
+    def search(self, value: Any) -> bool:
+        return self._find(self._key_of(value))[1] >= 0
+    
+    def get(self, key: Any) -> Any:
+        leaf, j = self._find(key)
+        return leaf.values[j] if j >= 0 else None
+    
+    def contains_key(self, key: Any) -> bool:
+        return self._find(key)[1] >= 0
+    
+    def delete(self, value: Any) -> bool:
+        return self.delete_key(self._key_of(value))
+    
+    def delete_key(self, key: Any) -> bool:
+        path: List[Tuple[_BPlusInternal, int]] = []
+        leaf = self._descend(key, path)
+        j = bisect_left(leaf.keys, key)
+        if j == len(leaf.keys) or leaf.keys[j] != key: return False
+        del leaf.keys[j], leaf.values[j]
+        for node, i in path: node.counts[i] -= 1
+        self._size -= 1
+        self._fix_underflow(leaf, path)
+        return True
+    
+    def _fix_underflow(self, node: Any, path: List[Tuple[_BPlusInternal, int]]):
+        # Borrow from a sibling with spare entries, otherwise merge with it and repeat one level up
+        while path:
+            is_leaf = type(node) is _BPlusLeaf
+            if len(node.keys if is_leaf else node.children) >= self._min: return
+            parent, i = path.pop()
+            left = parent.children[i - 1] if i > 0 else None
+            right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+            if is_leaf:
+                if left is not None and len(left.keys) > self._min:
+                    node.keys.insert(0, left.keys.pop())
+                    node.values.insert(0, left.values.pop())
+                    parent.keys[i - 1] = node.keys[0]
+                    parent.counts[i - 1] -= 1
+                    parent.counts[i] += 1
+                    return
+                if right is not None and len(right.keys) > self._min:
+                    node.keys.append(right.keys.pop(0))
+                    node.values.append(right.values.pop(0))
+                    parent.keys[i] = right.keys[0]
+                    parent.counts[i + 1] -= 1
+                    parent.counts[i] += 1
+                    return
+                if left is None: left, node, i = node, right, i + 1
+                left.keys += node.keys
+                left.values += node.values
+                left.next = node.next
+                if node.next is not None: node.next.prev = left
+            else:
+                if left is not None and len(left.children) > self._min:
+                    moved = left.counts.pop()
+                    node.keys.insert(0, parent.keys[i - 1])
+                    parent.keys[i - 1] = left.keys.pop()
+                    node.children.insert(0, left.children.pop())
+                    node.counts.insert(0, moved)
+                    parent.counts[i - 1] -= moved
+                    parent.counts[i] += moved
+                    return
+                if right is not None and len(right.children) > self._min:
+                    moved = right.counts.pop(0)
+                    node.keys.append(parent.keys[i])
+                    parent.keys[i] = right.keys.pop(0)
+                    node.children.append(right.children.pop(0))
+                    node.counts.append(moved)
+                    parent.counts[i + 1] -= moved
+                    parent.counts[i] += moved
+                    return
+                if left is None: left, node, i = node, right, i + 1
+                left.keys += [parent.keys[i - 1]] + node.keys
+                left.children += node.children
+                left.counts += node.counts
+            # `node` (now parent.children[i]) has been folded into its left neighbour
+            parent.counts[i - 1] += parent.counts[i]
+            del parent.keys[i - 1], parent.children[i], parent.counts[i]
+            node = parent
+        if type(self.root) is _BPlusInternal and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+    
+    def get_height(self) -> int:
+        if self._size == 0: return 0
+        height, node = 1, self.root
+        while type(node) is _BPlusInternal:
+            height += 1
+            node = node.children[0]
+        return height
+    
+    def get_size(self) -> int: return self._size
+    
+    def bytes_per_node(self) -> float:
+        # Structural bytes (nodes and their lists) per stored value, keys/values themselves excluded
+        total, stack = 0, [self.root]
+        while stack:
+            node = stack.pop()
+            total += sys.getsizeof(node) + sys.getsizeof(node.keys)
+            if type(node) is _BPlusLeaf:
+                total += sys.getsizeof(node.values)
+            else:
+                total += sys.getsizeof(node.children) + sys.getsizeof(node.counts)
+                stack.extend(node.children)
+        return total / self._size if self._size else 0.0
+    
+    def find_min(self) -> Any:
+        leaf = self._edge_leaf(last=False)
+        return leaf.values[0] if leaf.values else None
+    
+    def find_max(self) -> Any:
+        leaf = self._edge_leaf(last=True)
+        return leaf.values[-1] if leaf.values else None
+    
+    def _iter_leaves(self, leaf: Optional[_BPlusLeaf], start: int = 0) -> Iterator[Any]:
+        # Linked-leaf scan: one list slice per leaf, no per-value pointer chasing
+        while leaf is not None:
+            yield from leaf.values[start:] if start else leaf.values
+            leaf, start = leaf.next, 0
+    
+    def iter_inorder(self) -> Iterator[Any]:
+        return self._iter_leaves(self._edge_leaf(last=False))
+    
+    def __reversed__(self) -> Iterator[Any]:
+        leaf = self._edge_leaf(last=True)
+        while leaf is not None:
+            yield from reversed(leaf.values)
+            leaf = leaf.prev
+    
+    def iter_preorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_postorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_levelorder(self) -> Iterator[Any]: return self.iter_inorder()
+    
+    def traverse_inorder(self) -> List[Any]: return list(self.iter_inorder())
+    def traverse_preorder(self) -> List[Any]: return list(self.iter_preorder())
+    def traverse_postorder(self) -> List[Any]: return list(self.iter_postorder())
+    
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        if lo is None:
+            leaf, j = self._edge_leaf(last=False), 0
+        else:
+            leaf = self._descend(lo)
+            j = (bisect_left if lo_inc else bisect_right)(leaf.keys, lo)
+        while leaf is not None:
+            keys = leaf.keys
+            end = len(keys)
+            if hi is not None and keys and (hi < keys[-1] or (not hi_inc and hi == keys[-1])):
+                end = (bisect_right if hi_inc else bisect_left)(keys, hi, j)
+                yield from leaf.values[j:end]
+                return
+            yield from leaf.values[j:end]
+            leaf, j = leaf.next, 0
+    
+    def _rank(self, key: Any, inclusive: bool = False) -> int:
+        rank, node = 0, self.root
+        while type(node) is _BPlusInternal:
+            i = bisect_right(node.keys, key)
+            rank += sum(node.counts[:i])
+            node = node.children[i]
+        return rank + (bisect_right if inclusive else bisect_left)(node.keys, key)
+    
+    def rank(self, key: Any) -> int:
+        return self._rank(key)
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        upper = self._size if hi is None else self._rank(hi, inclusive=hi_inc)
+        lower = 0 if lo is None else self._rank(lo, inclusive=not lo_inc)
+        return max(0, upper - lower)
+    
+    def _neighbour(self, key: Any, below: bool, strict: bool) -> Any:
+        leaf = self._descend(key)
+        if below:
+            j = (bisect_left if strict else bisect_right)(leaf.keys, key) - 1
+            if j >= 0: return leaf.values[j]
+            return leaf.prev.values[-1] if leaf.prev is not None else None
+        j = (bisect_right if strict else bisect_left)(leaf.keys, key)
+        if j < len(leaf.keys): return leaf.values[j]
+        return leaf.next.values[0] if leaf.next is not None else None
+    
+    def floor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=False)
+    def ceiling(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=False)
+    def successor(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=True)
+    def predecessor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=True)
+    
+    def _locate(self, index: int) -> Tuple[_BPlusLeaf, int]:
+        node = self.root
+        while type(node) is _BPlusInternal:
+            for i, count in enumerate(node.counts):
+                if index < count: break
+                index -= count
+            node = node.children[i]
+        return node, index
+    
+    def select(self, index: int) -> Any:
+        if not 0 <= index < self._size: return None
+        leaf, j = self._locate(index)
+        return leaf.values[j]
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        if offset < 0 or offset >= self._size or limit <= 0: return []
+        return list(islice(self._iter_leaves(*self._locate(offset)), limit))
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None,
+                    order: int = 64) -> 'BPlusTree':
+        tree = cls(key=key, order=order)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        return _bulk_insert(self, values)
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Bottom-up bulk load: full leaves linked left to right, then each internal level
+        # groups the level below evenly so no node ends up under half full
+        def groups(n: int) -> List[Tuple[int, int]]:
+            count = max(1, -(-n // self._order))
+            return [(n * g // count, n * (g + 1) // count) for g in range(count)]
+        leaves, prev = [], None
+        for lo, hi in groups(len(keys)):
+            leaf = _BPlusLeaf(keys[lo:hi], values[lo:hi])
+            leaf.prev = prev
+            if prev is not None: prev.next = leaf
+            leaves.append(leaf)
+            prev = leaf
+        level = [(leaf, leaf.keys[0] if leaf.keys else None, len(leaf.keys)) for leaf in leaves]
+        while len(level) > 1:
+            parents = []
+            for lo, hi in groups(len(level)):
+                chunk = level[lo:hi]
+                node = _BPlusInternal([first for _, first, _ in chunk[1:]],
+                                      [child for child, _, _ in chunk],
+                                      [count for _, _, count in chunk])
+                parents.append((node, chunk[0][1], sum(node.counts)))
+            level = parents
+        self.root = level[0][0]
+        self._size = len(keys)
+
+class SkipNode:
+    __slots__ = ('value', 'key', 'forward', 'width', 'prev')
+    
+    def __init__(self, value: Any, key: Any, level: int):
+        self.value = value
+        self.key = key
+        self.forward: List[Optional['SkipNode']] = [None] * level
+        self.width: List[int] = [1] * level  # Level-0 steps to forward[i], for rank/select
+        self.prev: Optional['SkipNode'] = None
+
+class SkipList(TreeInterface):
+    """Indexable skip list: no rebalancing at all, an update only relinks the
+    O(log n) expected towers around the new or removed node. Ordered values only,
+    so every traversal order yields them in key order."""
+    
+    MAX_LEVEL = 32
+    
+    def __init__(self, key: Optional[Callable[[Any], Any]] = None, p: float = 0.25):
+        self._head = SkipNode(None, None, self.MAX_LEVEL)
+        self._level = 1
+        self._size = 0
+        self._key = key
+        self._p = p
+    
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
+    
+    def _random_level(self) -> int:
+        level = 1
+        while level < self.MAX_LEVEL and random.random() < self._p: level += 1
+        return level
+    
+    def _seek(self, key: Any, inclusive: bool = False) -> Tuple[List[SkipNode], List[int]]:
+        # Last node per level whose key is below `key` (at-or-below when inclusive), with its position
+        update, positions = [self._head] * self.MAX_LEVEL, [0] * self.MAX_LEVEL
+        node, position = self._head, 0
+        for level in range(self._level - 1, -1, -1):
+            nxt = node.forward[level]
+            while nxt is not None and (nxt.key < key or (inclusive and nxt.key == key)):
+                position += node.width[level]
+                node, nxt = nxt, nxt.forward[level]
+            update[level], positions[level] = node, position
+        return update, positions
+    
+    def insert(self, value: Any) -> bool:
+        key = self._key_of(value)
+        update, positions = self._seek(key)
+        nxt = update[0].forward[0]
+        if nxt is not None and nxt.key == key: return False
+        level = self._random_level()
+        for lvl in range(self._level, level):
+            self._head.width[lvl] = self._size + 1  # Empty levels span to the end
+        self._level = max(self._level, level)
+        node = SkipNode(value, key, level)
+        position = positions[0] + 1
+        for lvl in range(level):
+            before = update[lvl]
+            node.forward[lvl] = before.forward[lvl]
+            before.forward[lvl] = node
+            node.width[lvl] = before.width[lvl] - (position - positions[lvl]) + 1
+            before.width[lvl] = position - positions[lvl]
+        for lvl in range(level, self._level):
+            update[lvl].width[lvl] += 1
+        node.prev = update[0] if update[0] is not self._head else None
+        if node.forward[0] is not None: node.forward[0].prev = node
+        self._size += 1
+        return True
+    
+    def _find(self, key: Any) -> Optional[SkipNode]:
+        node = self._seek(key)[0][0].forward[0]
+        return node if node is not None and node.key == key else None
+    
+    def search(self, value: Any) -> bool:
+        return self._find(self._key_of(value)) is not None
+    
+    def get(self, key: Any) -> Any:
+        node = self._find(key)
+        return node.value if node else None
+    
+    def contains_key(self, key: Any) -> bool:
+        return self._find(key) is not None
+    
+    def delete(self, value: Any) -> bool:
+        return self.delete_key(self._key_of(value))
+    
+    def delete_key(self, key: Any) -> bool:
+        update, _ = self._seek(key)
+        node = update[0].forward[0]
+        if node is None or node.key != key: return False
+        for lvl in range(self._level):
+            before = update[lvl]
+            if before.forward[lvl] is node:
+                before.width[lvl] += node.width[lvl] - 1
+                before.forward[lvl] = node.forward[lvl]
+            else:
+                before.width[lvl] -= 1
+        if node.forward[0] is not None: node.forward[0].prev = node.prev
+        while self._level > 1 and self._head.forward[self._level - 1] is None:
+            self._level -= 1
+        self._size -= 1
+        return True
+    
+    def get_height(self) -> int:
+        return self._level if self._size else 0
+    
+    def get_size(self) -> int: return self._size
+    
+    def bytes_per_node(self) -> float:
+        total, node = 0, self._head.forward[0]
+        while node is not None:
+            total += sys.getsizeof(node) + sys.getsizeof(node.forward) + sys.getsizeof(node.width)
+            node = node.forward[0]
+        return total / self._size if self._size else 0.0
+    
+    def _last(self) -> Optional[SkipNode]:
+        node = self._head
+        for level in range(self._level - 1, -1, -1):
+            while node.forward[level] is not None: node = node.forward[level]
+        return node if node is not self._head else None
+    
+    def find_min(self) -> Any:
+        node = self._head.forward[0]
+        return node.value if node else None
+    
+    def find_max(self) -> Any:
+        node = self._last()
+        return node.value if node else None
+    
+    def _walk(self, node: Optional[SkipNode]) -> Iterator[Any]:
+        while node is not None:
+            yield node.value
+            node = node.forward[0]
+    
+    def iter_inorder(self) -> Iterator[Any]: return self._walk(self._head.forward[0])
+    def iter_preorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_postorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_levelorder(self) -> Iterator[Any]: return self.iter_inorder()
+    
+    def __reversed__(self) -> Iterator[Any]:
+        node = self._last()
+        while node is not None:
+            yield node.value
+            node = node.prev
+    
+    def traverse_inorder(self) -> List[Any]: return list(self.iter_inorder())
+    def traverse_preorder(self) -> List[Any]: return list(self.iter_preorder())
+    def traverse_postorder(self) -> List[Any]: return list(self.iter_postorder())
+    
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        node = self._head.forward[0] if lo is None else self._seek(lo, inclusive=not lo_inc)[0][0].forward[0]
+        while node is not None:
+            if hi is not None and (hi < node.key or (not hi_inc and hi == node.key)): return
+            yield node.value
+            node = node.forward[0]
+    
+    def _rank(self, key: Any, inclusive: bool = False) -> int:
+        return self._seek(key, inclusive)[1][0]
+    
+    def rank(self, key: Any) -> int:
+        return self._rank(key)
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        upper = self._size if hi is None else self._rank(hi, inclusive=hi_inc)
+        lower = 0 if lo is None else self._rank(lo, inclusive=not lo_inc)
+        return max(0, upper - lower)
+    
+    def floor(self, key: Any) -> Any:
+        node = self._seek(key, inclusive=True)[0][0]
+        return node.value if node is not self._head else None
+    
+    def predecessor(self, key: Any) -> Any:
+        node = self._seek(key)[0][0]
+        return node.value if node is not self._head else None
+    
+    def ceiling(self, key: Any) -> Any:
+        node = self._seek(key)[0][0].forward[0]
+        return node.value if node else None
+    
+    def successor(self, key: Any) -> Any:
+        node = self._seek(key, inclusive=True)[0][0].forward[0]
+        return node.value if node else None
+    
+    def _select_node(self, index: int) -> SkipNode:
+        # Node at 1-based position index + 1, skipping whole spans via the widths
+        node, position = self._head, 0
+        for level in range(self._level - 1, -1, -1):
+            while node.forward[level] is not None and position + node.width[level] <= index + 1:
+                position += node.width[level]
+                node = node.forward[level]
+        return node
+    
+    def select(self, index: int) -> Any:
+        if not 0 <= index < self._size: return None
+        return self._select_node(index).value
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        if offset < 0 or offset >= self._size or limit <= 0: return []
+        return list(islice(self._walk(self._select_node(offset)), limit))
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], key: Optional[Callable[[Any], Any]] = None,
+                    p: float = 0.25) -> 'SkipList':
+        tree = cls(key=key, p=p)
+        tree._build(*_unique_sorted((tree._key_of(v), v) for v in values))
+        return tree
+    
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        return _bulk_insert(self, values)
+    
+    def _build(self, keys: List[Any], values: List[Any]):
+        # Append towers left to right, remembering the last tower (and its position) per level
+        self._head = head = SkipNode(None, None, self.MAX_LEVEL)
+        last, last_pos = [head] * self.MAX_LEVEL, [0] * self.MAX_LEVEL
+        self._level, prev = 1, None
+        for position, (key, value) in enumerate(zip(keys, values), 1):
+            level = self._random_level()
+            node = SkipNode(value, key, level)
+            node.prev = prev
+            for lvl in range(level):
+                last[lvl].forward[lvl] = node
+                last[lvl].width[lvl] = position - last_pos[lvl]
+                last[lvl], last_pos[lvl] = node, position
+            self._level = max(self._level, level)
+            prev = node
+        end = len(keys) + 1
+        for lvl in range(self.MAX_LEVEL):
+            last[lvl].width[lvl] = end - last_pos[lvl]
+        self._size = len(keys)
+
+# =============================================================================
+# TREE BACKEND REGISTRY
+# =============================================================================
+
+TREE_BACKENDS: Dict[str, type] = {
+    "bst": BinarySearchTree,
+    "avl": AVLTree,
+    "persistent_avl": PersistentAVLTree,
+    "array_avl": ArrayAVLTree,
+    "bplus": BPlusTree,
+    "redblack": RedBlackTree,
+    "treap": Treap,
+    "skiplist": SkipList,
+}
+
+def register_backend(name: str, cls: type):
+    if not (isinstance(cls, type) and issubclass(cls, TreeInterface)):
+        raise TypeError(f"{cls!r} does not implement TreeInterface")
+    TREE_BACKENDS[name] = cls
+
+def create_tree(backend: Any = "avl", **kwargs) -> TreeInterface:
+    # `backend` is a registered name or a TreeInterface subclass; kwargs go to its constructor.
+    # An already opened tree (e.g. a MappedBTree over an existing file) is used as is.
+    if isinstance(backend, TreeInterface):
+        return backend
+    if isinstance(backend, type) and issubclass(backend, TreeInterface):
+        return backend(**kwargs)
+    if backend not in TREE_BACKENDS:
+        raise ValueError(f"Unknown tree backend {backend!r}; choose from {', '.join(sorted(TREE_BACKENDS))}")
+    return TREE_BACKENDS[backend](**kwargs)
+
+def create_index(backend: Any = "avl", **kwargs) -> TreeInterface:
+    # create_tree for a manager index: managers insert and delete single values, so a
+    # read-only engine is rejected up front rather than failing on the first update
+    tree = create_tree(backend, **kwargs)
+    if tree.read_only:
+        raise ValueError(f"{type(tree).__name__} is read-only and cannot back a manager index")
+    return tree
+
+def benchmark_backends(size: int = 10000, backends: Optional[List[str]] = None,
+                       seed: int = 0) -> Dict[str, Dict[str, float]]:
+    # Same random workload on every backend: insert all keys, look each one up, delete half
+    rng = random.Random(seed)
+    keys = rng.sample(range(size * 10), size)
+    results = {}
+    for name in backends or list(TREE_BACKENDS):
+        tree = create_tree(name)
+        start = time.perf_counter()
+        for k in keys: tree.insert(k)
+        inserted = time.perf_counter()
+        for k in keys: tree.search(k)
+        searched = time.perf_counter()
+        height = tree.get_height()
+        for k in keys[::2]: tree.delete(k)
+        deleted = time.perf_counter()
+        results[name] = {"insert": inserted - start, "search": searched - inserted,
+                         "delete": deleted - searched, "height": height}
+    return results
+
+# =============================================================================
+# CONCURRENCY: READER-WRITER LOCKING
+# =============================================================================
+
+class ReadWriteLock:
+    """Any number of readers or a single writer, admitted in alternating phases: once a
+    writer is waiting new readers queue behind it, and when it releases, the readers
+    already queued go in before the next writer. Neither side starves the other and a
+    busy writer costs readers at most one update's wait. Reentrant per thread, and a
+    writer may also read; upgrading a held read lock would deadlock and raises
+    RuntimeError instead."""
+    
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer: Optional[int] = None  # Ident of the thread holding the write lock
+        self._writers_waiting = 0
+        self._readers_waiting = 0
+        self._admitted = 0  # Readers let in ahead of waiting writers by the last write release
+        self._local = threading.local()  # Per-thread nesting depth
+    
+    @contextmanager
+    def read(self):
+        self._acquire(False)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    @contextmanager
+    def write(self):
+        self._acquire(True)
+        try:
+            yield
+        finally:
+            self._release()
+    
+    def _acquire(self, write: bool):
+        local = self._local
+        depth = getattr(local, 'depth', 0)
+        if depth:
+            if write and self._writer != threading.get_ident():
+                raise RuntimeError("Cannot upgrade a read lock to a write lock")
+            local.depth = depth + 1
+            return
+        with self._cond:
+            if write:
+                self._writers_waiting += 1
+                while self._writer is not None or self._readers or self._admitted:
+                    self._cond.wait()
+                self._writers_waiting -= 1
+                self._writer = threading.get_ident()
+            else:
+                self._readers_waiting += 1
+                while self._writer is not None or (self._writers_waiting and not self._admitted):
+                    self._cond.wait()
+                self._readers_waiting -= 1
+                if self._admitted:
+                    self._admitted -= 1
+                self._readers += 1
+        local.depth = 1
+    
+    def _release(self):
+        local = self._local
+        local.depth -= 1
+        if local.depth:
+            return
+        with self._cond:
+            if self._writer == threading.get_ident():
+                self._writer = None
+                self._admitted = self._readers_waiting
+                self._cond.notify_all()
+            else:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+def read_locked(method: Callable) -> Callable:
+    # Shared access under the owner's `lock`, if it has one
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return method(self, *args, **kwargs)
+        with self.lock.read():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+def write_locked(method: Callable) -> Callable:
+    # Exclusive access under the owner's `lock`, if it has one
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.lock is None:
+            return method(self, *args, **kwargs)
+        with self.lock.write():
+            return method(self, *args, **kwargs)
+    return wrapper
+
+class ConcurrentTree(TreeInterface):
+    """Thread-safe view of any TreeInterface: lookups, ranges and traversals share a
+    ReadWriteLock and run alongside each other, updates take it exclusively. Iterators
+    are materialized under the lock, so a caller never walks nodes a writer is moving."""
+    
+    def __init__(self, tree: TreeInterface, lock: Optional[ReadWriteLock] = None):
+        self.tree = tree
+        self.lock = lock or ReadWriteLock()  # Pass one lock to keep several trees consistent
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], backend: Any = "avl", **kwargs) -> 'ConcurrentTree':
+        tree_cls = TREE_BACKENDS[backend] if isinstance(backend, str) else backend
+        return cls(tree_cls.from_sorted(values, **kwargs))
+    
+    @write_locked
+    def insert(self, value: Any) -> bool: return self.tree.insert(value)
+    @write_locked
+    def delete(self, value: Any) -> bool: return self.tree.delete(value)
+    @write_locked
+    def delete_key(self, key: Any) -> bool: return self.tree.delete_key(key)
+    @write_locked
+    def bulk_insert(self, values: Iterable[Any]) -> int: return self.tree.bulk_insert(values)
+    @write_locked
+    def replace(self, value: Any) -> bool: return self.tree.replace(value)
+    
+    @read_locked
+    def search(self, value: Any) -> bool: return self.tree.search(value)
+    @read_locked
+    def get(self, key: Any) -> Any: return self.tree.get(key)
+    @read_locked
+    def contains_key(self, key: Any) -> bool: return self.tree.contains_key(key)
+    @read_locked
+    def get_height(self) -> int: return self.tree.get_height()
+    @read_locked
+    def get_size(self) -> int: return self.tree.get_size()
+    @read_locked
+    def find_min(self) -> Any: return self.tree.find_min()
+    @read_locked
+    def find_max(self) -> Any: return self.tree.find_max()
+    @read_locked
+    def floor(self, key: Any) -> Any: return self.tree.floor(key)
+    @read_locked
+    def ceiling(self, key: Any) -> Any: return self.tree.ceiling(key)
+    @read_locked
+    def successor(self, key: Any) -> Any: return self.tree.successor(key)
+    @read_locked
+    def predecessor(self, key: Any) -> Any: return self.tree.predecessor(key)
+    @read_locked
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        return self.tree.count_range(lo, hi, inclusive)
+    @read_locked
+    def traverse_inorder(self) -> List[Any]: return self.tree.traverse_inorder()
+    @read_locked
+    def traverse_preorder(self) -> List[Any]: return self.tree.traverse_preorder()
+    @read_locked
+    def traverse_postorder(self) -> List[Any]: return self.tree.traverse_postorder()
+    @read_locked
+    def check_invariants(self) -> List[str]:
+        # Engines without their own checks have nothing to report
+        return self.tree.check_invariants() if hasattr(self.tree, 'check_invariants') else []
+    
+    # Order statistics and analysis helpers, so the wrapper stands in for the GUI's trees
+    @read_locked
+    def select(self, index: int) -> Any: return self.tree.select(index)
+    @read_locked
+    def rank(self, key: Any) -> int: return self.tree.rank(key)
+    @read_locked
+    def slice(self, offset: int, limit: int) -> List[Any]: return self.tree.slice(offset, limit)
+    @read_locked
+    def bytes_per_node(self) -> float: return self.tree.bytes_per_node()
+    @read_locked
+    def stats(self) -> Optional[TreeStats]:
+        # None for engines that keep no structural stats, which callers treat as "not available"
+        return self.tree.stats() if hasattr(self.tree, 'stats') else None
+    
+    @read_locked
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        return iter(list(self.tree.range(lo, hi, inclusive)))
+    @read_locked
+    def iter_inorder(self) -> Iterator[Any]: return iter(self.tree.traverse_inorder())
+    @read_locked
+    def iter_preorder(self) -> Iterator[Any]: return iter(self.tree.traverse_preorder())
+    @read_locked
+    def iter_postorder(self) -> Iterator[Any]: return iter(self.tree.traverse_postorder())
+    @read_locked
+    def iter_levelorder(self) -> Iterator[Any]: return iter(list(self.tree.iter_levelorder()))
+    @read_locked
+    def __reversed__(self) -> Iterator[Any]: return iter(list(reversed(self.tree)))
+
+def stress_inventory(readers: int = 4, products: int = 2000, updates: int = 1000,
+                     seed: int = 0) -> Dict[str, float]:
+    # Reader threads query a concurrent InventoryManager while one writer re-stocks it.
+    # Every read result is checked for consistency and the indexes are validated at the end.
+    rng = random.Random(seed)
+    inventory = InventoryManager(concurrent=True)
+    for i in range(products):
+        inventory.add_product(f"p{i}", 1.0, rng.randint(0, 50), f"c{i % 10}")
+    done = threading.Event()
+    errors: List[str] = []
+    reads = [0] * readers
+    
+    def reader(index: int):
+        local = random.Random(seed + index + 1)
+        while not done.is_set():
+            # Products are updated in place, so each query is checked before the lock is released
+            with inventory.lock.read():
+                threshold = local.randint(0, 50)
+                low = inventory.get_low_stock_products(threshold)
+                keys = [(p.quantity, p.product_id) for p in low]
+                if keys != sorted(keys) or (keys and keys[-1][0] > threshold):
+                    errors.append("low stock scan out of order")
+                category = f"c{local.randrange(10)}"
+                summary = inventory.get_category_summary(category)
+                scan = inventory.get_products_by_category(category)
+                if summary["skus"] != len(scan) or summary["units"] != sum(p.quantity for p in scan):
+                    errors.append("category summary disagrees with its scan")
+                if inventory.find_product(local.randint(1, products)) is None:
+                    errors.append("product vanished")
+            reads[index] += 3
+    
+    def read_rate(seconds: float) -> float:
+        before, start = sum(reads), time.perf_counter()
+        time.sleep(seconds)
+        return (sum(reads) - before) / (time.perf_counter() - start)
+    
+    threads = [threading.Thread(target=reader, args=(i,), daemon=True) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    idle_rate = read_rate(0.2)
+    start = time.perf_counter()
+    before = sum(reads)
+    for _ in range(updates):
+        inventory.update_stock(rng.randint(1, products), rng.randint(0, 50))
+    write_seconds = time.perf_counter() - start
+    busy_rate = (sum(reads) - before) / write_seconds
+    done.set()
+    for thread in threads:
+        thread.join()
+    errors.extend(inventory.check_invariants())
+    return {"reads_per_s": idle_rate, "reads_per_s_while_writing": busy_rate,
+            "updates_per_s": updates / write_seconds, "errors": len(errors)}
+
+# =============================================================================
+# PERSISTENCE: SORTED SNAPSHOTS + BINARY WRITE-AHEAD LOG
+# =============================================================================
+
+_RECORD_HEADER = struct.Struct('<IIQ')  # payload length, crc32, log sequence number
+_SNAPSHOT_MAGIC = b'TDSNAP1\n'
+_I64, _F64, _U32 = struct.Struct('<q'), struct.Struct('<d'), struct.Struct('<I')
+
+def _encode(value: Any, out: bytearray):
+    # Tagged binary encoding for the plain values the managers log and snapshot
+    if value is None:
+        out += b'N'
+    elif value is True or value is False:
+        out += b'T' if value else b'F'
+    elif isinstance(value, int):
+        out += b'i'
+        out += _I64.pack(value)
+    elif isinstance(value, float):
+        out += b'f'
+        out += _F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode('utf-8')
+        out += b's'
+        out += _U32.pack(len(data))
+        out += data
+    elif isinstance(value, (list, tuple)):
+        out += b'l'
+        out += _U32.pack(len(value))
+        for item in value:
+            _encode(item, out)
+    elif isinstance(value, dict):
+        out += b'd'
+        out += _U32.pack(len(value))
+        for k, v in value.items():
+            _encode(k, out)
+            _encode(v, out)
+    else:
+        raise TypeError(f"cannot persist {type(value).__name__} values")
+
+def _decode(buf: bytes, pos: int = 0) -> Tuple[Any, int]:
+    tag = buf[pos:pos + 1]
+    pos += 1
+    if tag == b'N': return None, pos
+    if tag == b'T': return True, pos
+    if tag == b'F': return False, pos
+    if tag == b'i': return _I64.unpack_from(buf, pos)[0], pos + 8
+    if tag == b'f': return _F64.unpack_from(buf, pos)[0], pos + 8
+    count = _U32.unpack_from(buf, pos)[0]
+    pos += 4
+    if tag == b's':
+        return buf[pos:pos + count].decode('utf-8'), pos + count
+    if tag == b'l':
+        items = []
+        for _ in range(count):
+            item, pos = _decode(buf, pos)
+            items.append(item)
+        return items, pos
+    if tag == b'd':
+        mapping = {}
+        for _ in range(count):
+            k, pos = _decode(buf, pos)
+            mapping[k], pos = _decode(buf, pos)
+        return mapping, pos
+    raise ValueError(f"corrupt record: unknown tag {tag!r}")
+
+def _frame(lsn: int, value: Any) -> bytes:
+    payload = bytearray()
+    _encode(value, payload)
+    return _RECORD_HEADER.pack(len(payload), zlib.crc32(payload), lsn) + payload
+
+def _fsync_directory(path: str):
+    # Make a rename durable; directories cannot be opened this way on Windows
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+class WriteAheadLog:
+    """Append-only log of framed records. Every append is written straight to the file,
+    so it survives the process dying; fsyncs are batched (group commit) and happen once
+    `sync_every` records are pending or, from a background flusher, `sync_interval`
+    seconds after the first unsynced one. A power loss can lose at most that window."""
+    
+    def __init__(self, path: str, next_lsn: int = 1, sync_every: int = 64, sync_interval: float = 0.05):
+        self.path = path
+        self.next_lsn = next_lsn
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._file = open(path, 'ab', buffering=0)
+        self._flusher = None
+        if sync_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="wal-flusher", daemon=True)
+            self._flusher.start()
+    
+    def append(self, record: Any) -> int:
+        with self._lock:
+            lsn = self.next_lsn
+            self._file.write(_frame(lsn, record))
+            self.next_lsn += 1
+            self._pending += 1
+            if self._pending >= self.sync_every:
+                self._fsync()
+            return lsn
+    
+    def _fsync(self):
+        os.fsync(self._file.fileno())
+        self._pending = 0
+    
+    def _flush_loop(self):
+        while not self._closed.wait(self.sync_interval):
+            with self._lock:
+                if self._pending and not self._file.closed:
+                    self._fsync()
+    
+    def sync(self):
+        with self._lock:
+            self._fsync()
+    
+    def truncate(self):
+        # Called once a snapshot covers every record in the log
+        with self._lock:
+            self._file.truncate(0)
+            self._fsync()
+    
+    def close(self):
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        with self._lock:
+            if not self._file.closed:
+                self._fsync()
+                self._file.close()
+    
+    @staticmethod
+    def read(path: str) -> Iterator[Tuple[int, Any]]:
+        # Yield (lsn, record) pairs, cutting the file back to the last intact record if the
+        # tail was torn by a crash mid-write
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        pos = 0
+        while pos + _RECORD_HEADER.size <= len(data):
+            length, crc, lsn = _RECORD_HEADER.unpack_from(data, pos)
+            start = pos + _RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            yield lsn, _decode(payload)[0]
+            pos = start + length
+        if pos < len(data):
+            with open(path, 'r+b') as f:
+                f.truncate(pos)
+
+def journaled(method: Callable) -> Callable:
+    # Log a successful mutation to the manager's journal so it can be replayed after a restart
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if self.journal is not None and result is not False:
+            self.journal.record(method.__name__, args, kwargs)
+        return result
+    return wrapper
+
+class PersistentStore:
+    """Durable storage for one manager (InventoryManager, RecommendationEngine or
+    TaskScheduler) in `directory`. Opening the store recovers the manager by bulk-loading
+    the latest sorted snapshot and replaying only the log records written after it; from
+    then on every journaled mutation is appended to the log, and a fresh snapshot is
+    written (and the log emptied) every `snapshot_every` records."""
+    
+    def __init__(self, manager: Any, directory: str, snapshot_every: int = 10000,
+                 sync_every: int = 64, sync_interval: float = 0.05):
+        os.makedirs(directory, exist_ok=True)
+        self.manager = manager
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.snapshot_path = os.path.join(directory, 'snapshot.bin')
+        self.wal_path = os.path.join(directory, 'wal.bin')
+        self._opcodes = {name: op for op, name in enumerate(manager.JOURNALED)}
+        last_lsn, self.replayed = self._recover()
+        self._since_snapshot = self.replayed
+        self.wal = WriteAheadLog(self.wal_path, last_lsn + 1, sync_every, sync_interval)
+        manager.journal = self
+    
+    def _recover(self) -> Tuple[int, int]:
+        last_lsn = replayed = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(_SNAPSHOT_MAGIC):
+                raise ValueError(f"{self.snapshot_path} is not a snapshot file")
+            length, crc, last_lsn = _RECORD_HEADER.unpack_from(data, len(_SNAPSHOT_MAGIC))
+            payload = data[len(_SNAPSHOT_MAGIC) + _RECORD_HEADER.size:]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                raise ValueError(f"{self.snapshot_path} is corrupt")
+            self.manager.restore_state(_decode(payload)[0])
+        manager = self.manager
+        for lsn, (op, args, kwargs) in WriteAheadLog.read(self.wal_path):
+            if lsn <= last_lsn:
+                continue  # Already in the snapshot: the crash came before the log was emptied
+            getattr(manager, manager.JOURNALED[op])(*args, **kwargs)
+            last_lsn = lsn
+            replayed += 1
+        return last_lsn, replayed
+    
+    def record(self, name: str, args: tuple, kwargs: Dict[str, Any]):
+        self.wal.append((self._opcodes[name], args, kwargs))
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self.snapshot()
+    
+    def snapshot(self):
+        # Write to a temporary file and rename over the old snapshot, then empty the log
+        self.wal.sync()
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_SNAPSHOT_MAGIC)
+            f.write(_frame(self.wal.next_lsn - 1, self.manager.snapshot_state()))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_directory(self.directory)
+        self.wal.truncate()
+        self._since_snapshot = 0
+        # Undo history is not persisted: a restart replays from here with none, so the
+        # running manager must not be able to undo past this point either
+        clear_history = getattr(self.manager, 'clear_history', None)
+        if clear_history is not None:
+            clear_history()
+    
+    def sync(self):
+        self.wal.sync()
+    
+    def close(self):
+        self.wal.close()
+        self.manager.journal = None
+
+# =============================================================================
+# ON-DISK INDEX: MEMORY-MAPPED B+TREE
+# =============================================================================
+
+_MAPPED_MAGIC = b'TDIDX1\n\0'
+_MAPPED_HEADER = struct.Struct('<8s?IQIQQQ')  # magic, little-endian, page size, count, height, root, first/last leaf
+_PAGE_HEADER = struct.Struct('=HH4xqq')  # kind, entries, previous leaf, next leaf (page 0 means none)
+_LEAF, _INTERNAL = 1, 2
+
+def _page_capacities(page_size: int) -> Tuple[int, int]:
+    # Leaf: keys[cap] + record offsets[cap + 1]; internal: separators[cap - 1] + children[cap] + counts[cap]
+    words = (page_size - _PAGE_HEADER.size) // 8
+    return (words - 1) // 2, (words + 1) // 3
+
+class MappedBTree(TreeInterface):
+    """Read-only B+tree kept in fixed-size pages of a file and read through mmap. Leaf
+    pages hold native int64 key and record-offset columns that are binary searched in
+    place; each value is a packed record decoded only when it is returned. Nothing is held
+    per value in Python, so memory stays bounded by the OS page cache whatever the
+    catalog size. Keys must be ints. Single inserts and deletes are not supported;
+    bulk_insert rewrites the file with the merged contents. The managers take it wrapped
+    in a MappedCatalog, which adds an in-memory overlay for changes."""
+    
+    read_only = True
+    
+    def __init__(self, path: str, key: Optional[Callable[[Any], Any]] = None,
+                 decode: Optional[Callable[[Any], Any]] = None, encode: Optional[Callable[[Any], Any]] = None):
+        self.path = path
+        self._key = key
+        self._decode = decode
+        self._encode = encode
+        self._open()
+    
+    def _open(self):
+        with open(self.path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, little, page_size, self._size, self._height, self._root, self._first, self._last = \
+            _MAPPED_HEADER.unpack_from(self._map, 0)
+        if magic != _MAPPED_MAGIC:
+            raise ValueError(f"{self.path} is not a mapped tree file")
+        if little != (sys.byteorder == 'little'):
+            raise ValueError(f"{self.path} was written on a machine with the other byte order")
+        if hasattr(mmap, 'MADV_RANDOM'):
+            self._map.madvise(mmap.MADV_RANDOM)  # Lookups touch a few scattered pages; skip readahead
+        self._page_size = page_size
+        self._page_words = page_size // 8
+        self._leaf_cap, self._internal_cap = _page_capacities(page_size)
+        self._words = memoryview(self._map).cast('q')
+    
+    def close(self):
+        self._words.release()
+        self._map.close()
+    
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
+    
+    # --- page access -------------------------------------------------------------
+    
+    def _page(self, page: int) -> Tuple[int, int, int, int]:
+        # (first column word, entries, previous leaf, next leaf)
+        kind, count, prev, nxt = _PAGE_HEADER.unpack_from(self._map, page * self._page_size)
+        return page * self._page_words + _PAGE_HEADER.size // 8, count, prev, nxt
+    
+    def _leaf_keys(self, page: int) -> Tuple[memoryview, int, int, int]:
+        base, count, prev, nxt = self._page(page)
+        return self._words[base:base + count], count, prev, nxt
+    
+    def _record(self, page: int, j: int) -> Any:
+        offsets = self._page(page)[0] + self._leaf_cap
+        value = _decode(self._map[self._words[offsets + j]:self._words[offsets + j + 1]])[0]
+        return value if self._decode is None else self._decode(value)
+    
+    def _descend(self, key: Any) -> Tuple[int, int]:
+        # Leaf page that would hold `key`, plus the number of values in the leaves before it
+        page, rank, cap = self._root, 0, self._internal_cap
+        for _ in range(self._height - 1):
+            base, count, _, _ = self._page(page)
+            i = bisect_right(self._words[base:base + count - 1], key)
+            counts = base + 2 * cap - 1
+            rank += sum(self._words[counts:counts + i])
+            page = self._words[base + cap - 1 + i]
+        return page, rank
+    
+    def _locate(self, index: int) -> Tuple[int, int]:
+        page, cap = self._root, self._internal_cap
+        for _ in range(self._height - 1):
+            base, count, _, _ = self._page(page)
+            counts = base + 2 * cap - 1
+            for i in range(count):
+                if index < self._words[counts + i]: break
+                index -= self._words[counts + i]
+            page = self._words[base + cap - 1 + i]
+        return page, index
+    
+    def _iter_leaves(self, page: int, start: int = 0) -> Iterator[Any]:
+        while page:
+            base, count, _, page_next = self._page(page)
+            for j in range(start, count):
+                yield self._record(page, j)
+            page, start = page_next, 0
+    
+    # --- lookups -------------------------------------------------------------------
+    
+    def get(self, key: Any) -> Any:
+        if self._size == 0: return None
+        page = self._descend(key)[0]
+        keys, count, _, _ = self._leaf_keys(page)
+        j = bisect_left(keys, key)
+        return self._record(page, j) if j < count and keys[j] == key else None
+    
+    def contains_key(self, key: Any) -> bool:
+        if self._size == 0: return False
+        keys, count, _, _ = self._leaf_keys(self._descend(key)[0])
+        j = bisect_left(keys, key)
+        return j < count and keys[j] == key
+    
+    def search(self, value: Any) -> bool:
+        return self.contains_key(self._key_of(value))
+    
+    def insert(self, value: Any) -> bool:
+        raise io.UnsupportedOperation("MappedBTree is read-only; use bulk_insert to rewrite it")
+    
+    def delete(self, value: Any) -> bool:
+        return self.delete_key(self._key_of(value))
+    
+    def delete_key(self, key: Any) -> bool:
+        raise io.UnsupportedOperation("MappedBTree is read-only")
+    
+    def get_height(self) -> int: return self._height
+    def get_size(self) -> int: return self._size
+    
+    def find_min(self) -> Any:
+        return self._record(self._first, 0) if self._size else None
+    
+    def find_max(self) -> Any:
+        return self._record(self._last, self._page(self._last)[1] - 1) if self._size else None
+    
+    def iter_inorder(self) -> Iterator[Any]:
+        return self._iter_leaves(self._first if self._size else 0)
+    
+    def __reversed__(self) -> Iterator[Any]:
+        page = self._last if self._size else 0
+        while page:
+            base, count, page_prev, _ = self._page(page)
+            for j in range(count - 1, -1, -1):
+                yield self._record(page, j)
+            page = page_prev
+    
+    def iter_preorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_postorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_levelorder(self) -> Iterator[Any]: return self.iter_inorder()
+    
+    def traverse_inorder(self) -> List[Any]: return list(self.iter_inorder())
+    def traverse_preorder(self) -> List[Any]: return list(self.iter_preorder())
+    def traverse_postorder(self) -> List[Any]: return list(self.iter_postorder())
+    
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        if self._size == 0: return
+        if lo is None:
+            page, j = self._first, 0
+        else:
+            page = self._descend(lo)[0]
+            j = (bisect_left if lo_inc else bisect_right)(self._leaf_keys(page)[0], lo)
+        while page:
+            keys, count, _, page_next = self._leaf_keys(page)
+            end = count
+            if hi is not None and count and (hi < keys[-1] or (not hi_inc and hi == keys[-1])):
+                end = (bisect_right if hi_inc else bisect_left)(keys, hi, j)
+                page_next = 0
+            keys.release()  # Don't pin the map while suspended, so it can still be closed or rewritten
+            for i in range(j, end):
+                yield self._record(page, i)
+            page, j = page_next, 0
+    
+    def _rank(self, key: Any, inclusive: bool = False) -> int:
+        if self._size == 0: return 0
+        page, rank = self._descend(key)
+        return rank + (bisect_right if inclusive else bisect_left)(self._leaf_keys(page)[0], key)
+    
+    def rank(self, key: Any) -> int:
+        return self._rank(key)
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        lo_inc, hi_inc = (inclusive, inclusive) if isinstance(inclusive, bool) else inclusive
+        upper = self._size if hi is None else self._rank(hi, inclusive=hi_inc)
+        lower = 0 if lo is None else self._rank(lo, inclusive=not lo_inc)
+        return max(0, upper - lower)
+    
+    def _neighbour(self, key: Any, below: bool, strict: bool) -> Any:
+        if self._size == 0: return None
+        page = self._descend(key)[0]
+        keys, count, page_prev, page_next = self._leaf_keys(page)
+        if below:
+            j = (bisect_left if strict else bisect_right)(keys, key) - 1
+            if j >= 0: return self._record(page, j)
+            return self._record(page_prev, self._page(page_prev)[1] - 1) if page_prev else None
+        j = (bisect_right if strict else bisect_left)(keys, key)
+        if j < count: return self._record(page, j)
+        return self._record(page_next, 0) if page_next else None
+    
+    def floor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=False)
+    def ceiling(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=False)
+    def successor(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=True)
+    def predecessor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=True)
+    
+    def select(self, index: int) -> Any:
+        if not 0 <= index < self._size: return None
+        return self._record(*self._locate(index))
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        if offset < 0 or offset >= self._size or limit <= 0: return []
+        return list(islice(self._iter_leaves(*self._locate(offset)), limit))
+    
+    # --- building ------------------------------------------------------------------
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], path: str = '', key: Optional[Callable[[Any], Any]] = None,
+                    decode: Optional[Callable[[Any], Any]] = None, encode: Optional[Callable[[Any], Any]] = None,
+                    page_size: int = 4096) -> 'MappedBTree':
+        if not path: raise ValueError("MappedBTree.from_sorted needs a file path")
+        key_of = (lambda v: v) if key is None else key
+        tmp_path = path + '.tmp'
+        _write_mapped_tree(tmp_path, ((key_of(v), v) for v in values), encode, page_size)
+        os.replace(tmp_path, path)
+        return cls(path, key, decode, encode)
+    
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        # Merge with the current contents; existing entries win on equal keys
+        before = self._size
+        new_pairs = sorted(((self._key_of(v), v) for v in values), key=lambda pair: pair[0])
+        old_pairs = ((self._key_of(v), v) for v in self.iter_inorder())
+        self._rewrite(merge(old_pairs, new_pairs, key=lambda pair: pair[0]))
+        return self._size - before
+    
+    def _rewrite(self, pairs: Iterable[Tuple[Any, Any]]):
+        # Write sorted (key, value) pairs to a new file, then swap it in and remap
+        tmp_path = self.path + '.tmp'
+        _write_mapped_tree(tmp_path, pairs, self._encode, self._page_size)
+        self.close()
+        os.replace(tmp_path, self.path)
+        self._open()
+
+def _write_mapped_tree(path: str, pairs: Iterable[Tuple[Any, Any]], encode: Optional[Callable[[Any], Any]],
+                       page_size: int):
+    # Streams (key, value) pairs sorted by key into `path`: each leaf's records are written
+    # just before the leaf page itself, then the internal levels go on top. Only one entry
+    # per page is kept in memory. Equal keys keep the first value, as in _unique_sorted.
+    leaf_cap, internal_cap = _page_capacities(page_size)
+    header_words = _PAGE_HEADER.size // 8
+    level: List[Tuple[int, int, int]] = []  # (first key, page, values below) per node of the level being built
+    with open(path, 'wb') as f:
+        f.write(bytes(page_size))  # Header page, filled in last
+        
+        def write_page(kind: int, count: int, prev: int, columns: List[Tuple[int, List[int]]]) -> int:
+            f.write(bytes(-f.tell() % page_size))
+            page = bytearray(page_size)
+            _PAGE_HEADER.pack_into(page, 0, kind, count, prev, 0)
+            for word, column in columns:
+                data = array('q', column).tobytes()
+                start = (header_words + word) * 8
+                page[start:start + len(data)] = data
+            number = f.tell() // page_size
+            f.write(page)
+            return number
+        
+        keys: List[int] = []
+        offsets: List[int] = []
+        leaves: List[int] = []
+        
+        def flush_leaf():
+            offsets.append(f.tell())
+            page = write_page(_LEAF, len(keys), leaves[-1] if leaves else 0, [(0, keys), (leaf_cap, offsets)])
+            level.append((keys[0], page, len(keys)))
+            leaves.append(page)
+            keys.clear()
+            offsets.clear()
+        
+        record = bytearray()
+        last_key = None
+        for key, value in pairs:
+            if not isinstance(key, int):
+                raise TypeError(f"MappedBTree keys must be ints, not {type(key).__name__}")
+            if keys or level:
+                last = keys[-1] if keys else last_key
+                if key == last: continue
+                if key < last: raise ValueError("values must be sorted by key")
+            if len(keys) == leaf_cap:
+                flush_leaf()
+            keys.append(key)
+            offsets.append(f.tell())
+            record.clear()
+            _encode(value if encode is None else encode(value), record)
+            f.write(record)
+            last_key = key
+        if keys:
+            flush_leaf()
+        
+        # Link each leaf to the next now that every page number is known
+        for page, page_next in zip(leaves, leaves[1:]):
+            f.seek(page * page_size + _PAGE_HEADER.size - 8)
+            f.write(struct.pack('=q', page_next))
+        f.seek(0, os.SEEK_END)
+        
+        size = sum(count for _, _, count in level)
+        height = 1 if level else 0
+        while len(level) > 1:
+            # Spread each level evenly so no internal page ends up nearly empty
+            groups = -(-len(level) // internal_cap)
+            bounds = [len(level) * g // groups for g in range(groups + 1)]
+            level = [(level[lo][0],
+                      write_page(_INTERNAL, hi - lo, 0, [(0, [k for k, _, _ in level[lo + 1:hi]]),
+                                                         (internal_cap - 1, [p for _, p, _ in level[lo:hi]]),
+                                                         (2 * internal_cap - 1, [c for _, _, c in level[lo:hi]])]),
+                      sum(c for _, _, c in level[lo:hi]))
+                     for lo, hi in zip(bounds, bounds[1:])]
+            height += 1
+        f.seek(0)
+        f.write(_MAPPED_HEADER.pack(_MAPPED_MAGIC, sys.byteorder == 'little', page_size, size, height,
+                                    level[0][1] if level else 0, leaves[0] if leaves else 0,
+                                    leaves[-1] if leaves else 0))
+        f.flush()
+        os.fsync(f.fileno())
+
+class MappedCatalog(TreeInterface):
+    """Writable catalog over a MappedBTree, for the managers' primary indexes. The file
+    holds the bulk of the values; changes since it was written live in a small overlay:
+    an AVL tree of added or replaced values that shadows the file, and an AVL tree of file
+    keys that are deleted or shadowed. Reads consult the overlay first and ordered reads
+    merge it with the file's leaves, so memory grows with the changes, not the catalog.
+    Values read from the file are decoded copies: a caller that edits one stores it back
+    with replace(). compact() folds the overlay into a new file."""
     
-    def _update_height(self, node: AVLNode):
-        left_h = node.left.height if node.left else 0
-        right_h = node.right.height if node.right else 0
-        node.height = 1 + max(left_h, right_h)
+    def __init__(self, base: MappedBTree):
+        self.base = base
+        self._key = base._key
+        self._changed = AVLTree(key=base._key)
+        self._hidden = AVLTree()  # Always a subset of the file's keys
     
-    def _balance_node(self, node: AVLNode) -> AVLNode:
-        balance = self._get_balance(node)
-        if balance > 1:
-            if self._get_balance(node.left) < 0:
-                node.left = self._rotate_left(node.left)
-            return self._rotate_right(node)
-        if balance < -1:
-            if self._get_balance(node.right) > 0:
-                node.right = self._rotate_right(node.right)
-            return self._rotate_left(node)
-        return node
+    def _key_of(self, value: Any) -> Any:
+        return value if self._key is None else self._key(value)
     
-    def _get_balance(self, node: AVLNode) -> int:
-        left_h = node.left.height if node.left else 0
-        right_h = node.right.height if node.right else 0
-        return left_h - right_h
+    def close(self):
+        self.base.close()
     
-    def _rotate_left(self, z: AVLNode) -> AVLNode:
-        y = z.right
-        T2 = y.left
-        y.left = z
-        z.right = T2
-        self._update_height(z)
-        self._update_height(y)
-        return y
+    def compact(self):
+        # Rewrite the file with the overlay applied and start over with an empty one
+        if self._changed.get_size() or self._hidden.get_size():
+            self._rewrite([])
     
-    def _rotate_right(self, z: AVLNode) -> AVLNode:
-        y = z.left
-        T3 = y.right
-        y.right = z
-        z.left = T3
-        self._update_height(z)
-        self._update_height(y)
-        return y
+    def _rewrite(self, new_pairs: List[Tuple[Any, Any]]):
+        # Current values win on equal keys, as in MappedBTree.bulk_insert
+        pairs = ((self._key_of(v), v) for v in self.iter_inorder())
+        self.base._rewrite(merge(pairs, new_pairs, key=lambda pair: pair[0]))
+        self._changed = AVLTree(key=self._key)
+        self._hidden = AVLTree()
+    
+    def _visible(self, values: Iterator[Any]) -> Iterator[Any]:
+        # File values minus the hidden keys
+        if self._hidden.get_size() == 0: return values
+        return (v for v in values if not self._hidden.contains_key(self._key_of(v)))
+    
+    def _merged(self, base_values: Iterator[Any], changed_values: Iterator[Any], reverse: bool = False) -> Iterator[Any]:
+        return merge(self._visible(base_values), changed_values, key=self._key_of, reverse=reverse)
+    
+    # --- lookups and updates ---------------------------------------------------------
+    
+    def get(self, key: Any) -> Any:
+        value = self._changed.get(key)
+        if value is not None or self._hidden.contains_key(key): return value
+        return self.base.get(key)
+    
+    def contains_key(self, key: Any) -> bool:
+        if self._changed.contains_key(key): return True
+        return not self._hidden.contains_key(key) and self.base.contains_key(key)
     
     def search(self, value: Any) -> bool:
-        return self._search_recursive(self.root, value)
+        return self.contains_key(self._key_of(value))
     
-    def _search_recursive(self, node: Optional[AVLNode], value: Any) -> bool:
-        if node is None: return False
-        if value == node.value: return True
-        return (self._search_recursive(node.left, value) if value < node.value 
-                else self._search_recursive(node.right, value))
+    def insert(self, value: Any) -> bool:
+        # A key that is not visible is either new or already hidden in the file
+        if self.contains_key(self._key_of(value)): return False
+        return self._changed.insert(value)
     
     def delete(self, value: Any) -> bool:
-        if self.root is None: return False
-        self.root, deleted = self._delete_recursive(self.root, value)
-        if deleted: self._size -= 1
-        return deleted
-    
-    def _delete_recursive(self, node: AVLNode, value: Any) -> Tuple[Optional[AVLNode], bool]:
-        if value < node.value:
-            if node.left is None: return node, False
-            node.left, deleted = self._delete_recursive(node.left, value)
-            if not deleted: return node, False
-        elif value > node.value:
-            if node.right is None: return node, False
-            node.right, deleted = self._delete_recursive(node.right, value)
-            if not deleted: return node, False
-        else:
-            if node.left is None: return node.right, True
-            elif node.right is None: return node.left, True
-            temp = self._find_min_node(node.right)
-            node.value = temp.value
-            node.right, _ = self._delete_recursive(node.right, temp.value)
-            deleted = True
-        self._update_height(node)
-        return self._balance_node(node), True
+        return self.delete_key(self._key_of(value))
     
-    def _find_min_node(self, node: AVLNode) -> AVLNode:
-        while node.left: node = node.left
-        return node
+    def delete_key(self, key: Any) -> bool:
+        if self._changed.delete_key(key): return True  # A file value it shadowed stays hidden
+        return self.base.contains_key(key) and self._hidden.insert(key)
     
-    def get_height(self) -> int:
-        return self.root.height if self.root else 0
+    def replace(self, value: Any) -> bool:
+        if self._changed.replace(value): return True
+        key = self._key_of(value)
+        if not self.base.contains_key(key) or not self._hidden.insert(key): return False
+        return self._changed.insert(value)
     
-    def get_size(self) -> int: return self._size
+    def get_height(self) -> int: return max(self.base.get_height(), self._changed.get_height())
+    def get_size(self) -> int: return self.base.get_size() - self._hidden.get_size() + self._changed.get_size()
     
-    def traverse_inorder(self) -> List[Any]:
-        result = []; self._inorder_recursive(self.root, result); return result
+    def bytes_per_node(self) -> float:
+        # Python memory spent per value, which is the overlay's alone
+        size = self.get_size()
+        overlay = sum(tree.get_size() * tree.bytes_per_node() for tree in (self._changed, self._hidden))
+        return overlay / size if size else 0.0
     
-    def _inorder_recursive(self, node: Optional[AVLNode], result: List[Any]):
-        if node:
-            self._inorder_recursive(node.left, result)
-            result.append(node.value)
-            self._inorder_recursive(node.right, result)
+    def check_invariants(self) -> List[str]:
+        problems = self._changed.check_invariants() + self._hidden.check_invariants()
+        problems.extend(f"hidden key {key!r} is not in the file" for key in self._hidden
+                        if not self.base.contains_key(key))
+        problems.extend(f"key {key!r} shadows the file but is not hidden"
+                        for key in map(self._key_of, self._changed)
+                        if self.base.contains_key(key) and not self._hidden.contains_key(key))
+        return problems
     
-    def traverse_preorder(self) -> List[Any]:
-        result = []; self._preorder_recursive(self.root, result); return result
+    # --- ordered access ------------------------------------------------------------
     
-    def _preorder_recursive(self, node: Optional[AVLNode], result: List[Any]):
-        if node:
-            result.append(node.value)
-            self._preorder_recursive(node.left, result)
-            self._preorder_recursive(node.right, result)
+    def find_min(self) -> Any: return next(self.iter_inorder(), None)
+    def find_max(self) -> Any: return next(reversed(self), None)
     
-    def traverse_postorder(self) -> List[Any]:
-        result = []; self._postorder_recursive(self.root, result); return result
+    def iter_inorder(self) -> Iterator[Any]:
+        return self._merged(self.base.iter_inorder(), self._changed.iter_inorder())
     
-    def _postorder_recursive(self, node: Optional[AVLNode], result: List[Any]):
-        if node:
-            self._postorder_recursive(node.left, result)
-            self._postorder_recursive(node.right, result)
-            result.append(node.value)
+    def __reversed__(self) -> Iterator[Any]:
+        return self._merged(reversed(self.base), reversed(self._changed), reverse=True)
     
-    def find_min(self) -> Any:
-        if self.root is None: return None
-        current = self.root
-        while current.left: current = current.left
-        return current.value
+    def iter_preorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_postorder(self) -> Iterator[Any]: return self.iter_inorder()
+    def iter_levelorder(self) -> Iterator[Any]: return self.iter_inorder()
     
-    def find_max(self) -> Any:
-        if self.root is None: return None
-        current = self.root
-        while current.right: current = current.right
-        return current.value
+    def traverse_inorder(self) -> List[Any]: return list(self.iter_inorder())
+    def traverse_preorder(self) -> List[Any]: return list(self.iter_preorder())
+    def traverse_postorder(self) -> List[Any]: return list(self.iter_postorder())
+    
+    def range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> Iterator[Any]:
+        return self._merged(self.base.range(lo, hi, inclusive), self._changed.range(lo, hi, inclusive))
+    
+    def count_range(self, lo: Any = None, hi: Any = None, inclusive: Any = True) -> int:
+        return (self.base.count_range(lo, hi, inclusive) - self._hidden.count_range(lo, hi, inclusive)
+                + self._changed.count_range(lo, hi, inclusive))
+    
+    def rank(self, key: Any) -> int:
+        return self.base.rank(key) - self._hidden.rank(key) + self._changed.rank(key)
+    
+    def _neighbour(self, key: Any, below: bool, strict: bool) -> Any:
+        # Nearest file value that is not hidden, against the overlay's nearest
+        lookup = ('predecessor' if strict else 'floor') if below else ('successor' if strict else 'ceiling')
+        step = self.base.predecessor if below else self.base.successor
+        value = getattr(self.base, lookup)(key)
+        while value is not None and self._hidden.contains_key(self._key_of(value)):
+            value = step(self._key_of(value))
+        other = getattr(self._changed, lookup)(key)
+        if value is None or other is None: return other if value is None else value
+        return (max if below else min)(value, other, key=self._key_of)
+    
+    def floor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=False)
+    def ceiling(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=False)
+    def successor(self, key: Any) -> Any: return self._neighbour(key, below=False, strict=True)
+    def predecessor(self, key: Any) -> Any: return self._neighbour(key, below=True, strict=True)
+    
+    def select(self, index: int) -> Any:
+        # Walk the overlay, placing each value among the visible file values before it;
+        # O(overlay * log n)
+        if not 0 <= index < self.get_size(): return None
+        before = 0  # Overlay values ahead of `index`
+        for value in self._changed:
+            key = self._key_of(value)
+            position = before + self.base.rank(key) - self._hidden.rank(key)
+            if position == index: return value
+            if position > index: break
+            before += 1
+        position = index - before  # Among the visible file values; step over the hidden ones
+        for key in self._hidden:
+            if self.base.rank(key) > position: break
+            position += 1
+        return self.base.select(position)
+    
+    def slice(self, offset: int, limit: int) -> List[Any]:
+        first = self.select(offset) if limit > 0 else None
+        if first is None: return []
+        return list(islice(self.range(self._key_of(first), None), limit))
+    
+    # --- building ------------------------------------------------------------------
+    
+    @classmethod
+    def from_sorted(cls, values: Iterable[Any], path: str = '', key: Optional[Callable[[Any], Any]] = None,
+                    decode: Optional[Callable[[Any], Any]] = None, encode: Optional[Callable[[Any], Any]] = None,
+                    page_size: int = 4096) -> 'MappedCatalog':
+        return cls(MappedBTree.from_sorted(values, path, key, decode, encode, page_size))
+    
+    def bulk_insert(self, values: Iterable[Any]) -> int:
+        # One rewrite applies the overlay and adds the new values
+        before = self.get_size()
+        self._rewrite(sorted(((self._key_of(v), v) for v in values), key=lambda pair: pair[0]))
+        return self.get_size() - before
 
 # =============================================================================
 # PROJECT 1: SMART INVENTORY MANAGEMENT SYSTEM
 # =============================================================================
 
 class Product:
+    __slots__ = ('product_id', 'name', 'price', 'quantity', 'category')
+    
     def __init__(self, product_id: int, name: str, price: float, quantity: int, category: str):
         self.product_id = product_id
         self.name = name
@@ -354,70 +3232,209 @@ class Product:
     
     def __str__(self):
         return f"ID: {self.product_id}, Name: {self.name}, Price: ${self.price}, Qty: {self.quantity}, Category: {self.category}"
+    
+    # Plain tuples for snapshots and on-disk indexes
+    def to_record(self) -> tuple:
+        return (self.product_id, self.name, self.price, self.quantity, self.category)
+    
+    @classmethod
+    def from_record(cls, fields) -> 'Product':
+        return cls(*fields)
+
+class InventoryVersion(NamedTuple):
+    products: PersistentAVLTree
+    categories: PersistentAVLTree
+    stock: PersistentAVLTree
+    product_counter: int
+
+def undoable(method: Callable) -> Callable:
+    # Keep the version from before a successful change so undo() can return to it
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self.history is None:
+            return method(self, *args, **kwargs)
+        before = self.version()
+        result = method(self, *args, **kwargs)
+        if result is not False:
+            self.history.append(before)
+            self._publish()
+        return result
+    return wrapper
 
 class InventoryManager:
-    def __init__(self):
-        self.products_bst = BinarySearchTree()  # For quick search by ID
-        self.categories_avl = AVLTree()  # For category-based organization
+    JOURNALED = ('add_product', 'delete_product', 'update_stock', 'undo')
+    journal: Optional[PersistentStore] = None
+    lock: Optional[ReadWriteLock] = None
+    history: Optional[Deque[InventoryVersion]] = None
+    
+    def __init__(self, product_backend: Any = "avl", stock_backend: Any = "avl", concurrent: bool = False,
+                 versioned: bool = False, max_versions: int = 100):
+        category_backend = AVLTree
+        if versioned:
+            # Path-copying indexes: a version is three shared roots, taken and restored in O(1)
+            product_backend = stock_backend = category_backend = PersistentAVLTree
+            self.history = deque(maxlen=max_versions)
+        # Products live only in products_bst, which may be a file-backed MappedCatalog; the
+        # other indexes hold small tuples ending in the product ID and look products up by it
+        self.products_bst = create_index(product_backend, key=lambda p: p.product_id)  # For quick search by ID
+        # Category index stays an AVL tree: it relies on subtree aggregates
+        self.categories_avl = category_backend(key=lambda entry: entry[:2],
+                                               aggregate=lambda entry: (entry[2], entry[3] * entry[2]))  # (category, id, quantity, price)
+        self.stock_avl = create_index(stock_backend)  # (quantity, id), for low-stock range scans
         self.product_counter = 1
+        if self.products_bst.get_size():
+            # A catalog opened from a file arrives filled: index it and number new products after it
+            self._index_products(self.products_bst)
+            self.product_counter = self.products_bst.find_max().product_id + 1
+        if versioned:
+            self._publish()
+        if concurrent:
+            # Queries share the lock, mutations hold it exclusively across all three indexes
+            self.lock = ReadWriteLock()
     
+    @write_locked
+    @journaled
+    @undoable
     def add_product(self, name: str, price: float, quantity: int, category: str) -> bool:
         product = Product(self.product_counter, name, price, quantity, category)
         if self.products_bst.insert(product):
-            self.categories_avl.insert((category, product))
+            self.categories_avl.insert(self._category_entry(product))
+            self.stock_avl.insert((quantity, product.product_id))
             self.product_counter += 1
             return True
         return False
     
+    @read_locked
     def find_product(self, product_id: int) -> Optional[Product]:
-        # Create a dummy product for search
-        dummy = Product(product_id, "", 0, 0, "")
-        def search_func(node_value):
-            return node_value.product_id == product_id
-        
-        # We need to traverse to find the product
-        products = self.products_bst.traverse_inorder()
-        for product in products:
-            if product.product_id == product_id:
-                return product
-        return None
+        return self.products_bst.get(product_id)
     
+    @write_locked
+    @journaled
+    @undoable
     def delete_product(self, product_id: int) -> bool:
         product = self.find_product(product_id)
         if product:
-            self.products_bst.delete(product)
-            self.categories_avl.delete((product.category, product))
+            self.products_bst.delete_key(product_id)
+            self.categories_avl.delete_key((product.category, product_id))
+            self.stock_avl.delete_key((product.quantity, product_id))
             return True
         return False
     
+    @read_locked
     def get_products_by_category(self, category: str) -> List[Product]:
-        products = []
-        all_products = self.categories_avl.traverse_inorder()
-        for cat, product in all_products:
-            if cat == category:
-                products.append(product)
-        return products
+        # (category,) sorts before every (category, id) key, so the scan starts at the first match
+        entries = self.categories_avl.range((category,), (category, float('inf')))
+        return [self.products_bst.get(entry[1]) for entry in entries]
     
+    @read_locked
+    def get_category_summary(self, category: str) -> Dict[str, float]:
+        # SKU count from subtree sizes, units and stock value from subtree aggregates
+        lo, hi = (category,), (category, float('inf'))
+        units, value = self.categories_avl.aggregate_range(lo, hi) or (0, 0.0)
+        return {"skus": self.categories_avl.count_range(lo, hi), "units": units, "value": value}
+    
+    @read_locked
     def get_low_stock_products(self, threshold: int = 10) -> List[Product]:
-        low_stock = []
-        products = self.products_bst.traverse_inorder()
-        for product in products:
-            if product.quantity <= threshold:
-                low_stock.append(product)
-        return low_stock
+        # Lowest quantities first; stops at the first product above the threshold
+        entries = self.stock_avl.range(None, (threshold, float('inf')))
+        return [self.products_bst.get(product_id) for quantity, product_id in entries]
     
+    @write_locked
+    @journaled
+    @undoable
     def update_stock(self, product_id: int, new_quantity: int) -> bool:
         product = self.find_product(product_id)
         if product:
+            # Re-key the stock index: remove under the old quantity before changing it
+            self.stock_avl.delete_key((product.quantity, product_id))
+            if self.history is not None:
+                # Older versions share this Product, so the change goes into a copy
+                product = Product(product_id, product.name, product.price, product.quantity, product.category)
             product.quantity = new_quantity
+            self.products_bst.replace(product)  # Versions and file-backed catalogs need the value stored back
+            self.categories_avl.replace(self._category_entry(product))
+            self.stock_avl.insert((new_quantity, product_id))
             return True
         return False
+    
+    @staticmethod
+    def _category_entry(product: Product) -> Tuple[str, int, int, float]:
+        return (product.category, product.product_id, product.quantity, product.price)
+    
+    def _index_products(self, products: Iterable[Product]):
+        # Category and stock entries for products already in products_bst; read twice
+        self.categories_avl.bulk_insert(self._category_entry(p) for p in products)
+        self.stock_avl.bulk_insert((p.quantity, p.product_id) for p in products)
+    
+    def version(self) -> InventoryVersion:
+        # O(1) consistent view of all three indexes as of the last completed change;
+        # readers need no lock
+        if self.history is None:
+            raise ValueError("Versions need InventoryManager(versioned=True)")
+        return self._latest
+    
+    def _publish(self):
+        # A single assignment makes a finished change visible across all three indexes at once
+        self._latest = InventoryVersion(self.products_bst.snapshot(), self.categories_avl.snapshot(),
+                                        self.stock_avl.snapshot(), self.product_counter)
+    
+    @write_locked
+    @journaled
+    def undo(self) -> bool:
+        # Back to the version before the last successful change
+        if not self.history:
+            return False
+        self.restore_version(self.history.pop())
+        return True
+    
+    def restore_version(self, version: InventoryVersion):
+        self.products_bst = version.products.snapshot()
+        self.categories_avl = version.categories.snapshot()
+        self.stock_avl = version.stock.snapshot()
+        self.product_counter = version.product_counter
+        self._publish()
+    
+    def clear_history(self):
+        if self.history is not None:
+            self.history.clear()
+    
+    @read_locked
+    def check_invariants(self) -> List[str]:
+        # Each index is internally sound and all three hold the same products
+        problems = []
+        for name, tree in (("products", self.products_bst), ("categories", self.categories_avl),
+                           ("stock", self.stock_avl)):
+            if hasattr(tree, 'check_invariants'):
+                problems.extend(f"{name}: {problem}" for problem in tree.check_invariants())
+        categories = sorted(self._category_entry(p) for p in self.products_bst)
+        if list(self.categories_avl) != categories:
+            problems.append("categories: index disagrees with the products")
+        if list(self.stock_avl) != sorted((p.quantity, p.product_id) for p in self.products_bst):
+            problems.append("stock: index disagrees with the products")
+        return problems
+    
+    @read_locked
+    def snapshot_state(self) -> Dict[str, Any]:
+        products = [p.to_record() for p in self.products_bst]
+        return {"counter": self.product_counter, "products": products}
+    
+    @write_locked
+    def restore_state(self, state: Dict[str, Any]):
+        # Snapshots are in product_id order, so the primary index is built in one linear pass
+        products = [Product.from_record(fields) for fields in state["products"]]
+        self.products_bst.bulk_insert(products)
+        self._index_products(products)
+        self.product_counter = state["counter"]
+        if self.history is not None:
+            self._publish()
 
 # =============================================================================
 # PROJECT 2: AI-BASED RECOMMENDATION SYSTEM
 # =============================================================================
 
 class User:
+    __slots__ = ('user_id', 'name', 'preferences', 'rating_history')
+    
     def __init__(self, user_id: int, name: str, preferences: List[str]):
         self.user_id = user_id
         self.name = name
@@ -434,6 +3451,8 @@ class User:
         return f"User {self.user_id}: {self.name}"
 
 class ContentItem:
+    __slots__ = ('item_id', 'title', 'categories', 'features', 'avg_rating', 'rating_count')
+    
     def __init__(self, item_id: int, title: str, categories: List[str], features: Dict):
         self.item_id = item_id
         self.title = title
@@ -452,88 +3471,443 @@ class ContentItem:
         total = self.avg_rating * self.rating_count + new_rating
         self.rating_count += 1
         self.avg_rating = total / self.rating_count
+    
+    # Plain tuples for snapshots and on-disk indexes
+    def to_record(self) -> tuple:
+        return (self.item_id, self.title, self.categories, self.features, self.avg_rating, self.rating_count)
+    
+    @classmethod
+    def from_record(cls, fields) -> 'ContentItem':
+        item_id, title, categories, features, avg_rating, rating_count = fields
+        item = cls(item_id, title, categories, features)
+        item.avg_rating, item.rating_count = avg_rating, rating_count
+        return item
+
+class VectorScorer:
+    """NumPy mirror of the catalog for batch scoring: a category vocabulary, an item x
+    category 0/1 matrix and a dense avg_rating vector, updated as items are added and
+    rated. One matrix product gives every user's category overlap with every item; the
+    score is then 0.6 * overlap + 0.4 * rating / 5 in float64, bit for bit what
+    _calculate_match_score returns."""
+    
+    def __init__(self, capacity: int = 1024):
+        if np is None:
+            raise ImportError("vectorized scoring needs numpy")
+        self.vocabulary: Dict[str, int] = {}
+        self.items: List[ContentItem] = []
+        self._rows: Dict[int, int] = {}
+        self._item_ids = np.zeros(capacity, dtype=np.int64)
+        self._ratings = np.zeros(capacity)
+        self._bits = np.zeros((capacity, 16), dtype=np.float32)  # float32 so the product runs through BLAS
+    
+    def add_item(self, item: ContentItem):
+        row = len(self.items)
+        columns = [self.vocabulary.setdefault(c, len(self.vocabulary)) for c in set(item.categories)]
+        rows, cols = self._bits.shape
+        if row == rows or len(self.vocabulary) > cols:
+            # Grow geometrically in whichever dimension ran out
+            grown = np.zeros((rows * 2 if row == rows else rows, max(cols, 2 * len(self.vocabulary))), dtype=np.float32)
+            grown[:rows, :cols] = self._bits
+            self._bits = grown
+            if row == rows:
+                self._item_ids = np.resize(self._item_ids, rows * 2)
+                self._ratings = np.resize(self._ratings, rows * 2)
+        self._bits[row, columns] = 1.0
+        self._item_ids[row] = item.item_id
+        self._ratings[row] = item.avg_rating
+        self._rows[item.item_id] = row
+        self.items.append(item)
+    
+    def update_rating(self, item: ContentItem):
+        row = self._rows[item.item_id]
+        self._ratings[row] = item.avg_rating
+        self.items[row] = item
+    
+    def scores(self, preference_lists: List[List[str]]) -> 'np.ndarray':
+        # (users x items) scores for one block of users
+        n = len(self.items)
+        users = np.zeros((len(preference_lists), self._bits.shape[1]), dtype=np.float32)
+        for i, preferences in enumerate(preference_lists):
+            users[i, [self.vocabulary[c] for c in set(preferences) if c in self.vocabulary]] = 1.0
+        overlap = (users @ self._bits[:n].T).astype(np.float64)
+        return overlap * 0.6 + self._ratings[:n] / 5.0 * 0.4
+    
+    def top_k(self, preference_lists: List[List[str]], k: int, block: int = 256) -> List[List[ContentItem]]:
+        # Users are scored `block` at a time to bound the score matrix
+        results: List[List[ContentItem]] = []
+        n = len(self.items)
+        ids = self._item_ids[:n]
+        for start in range(0, len(preference_lists), block):
+            for row in self.scores(preference_lists[start:start + block]):
+                if k <= 0 or n == 0:
+                    results.append([])
+                    continue
+                if k < n:
+                    # Everything tied with the k-th best stays in, so the lower item_id wins ties
+                    kth = row[np.argpartition(-row, k - 1)[k - 1]]
+                    picked = np.flatnonzero(row >= kth)
+                else:
+                    picked = np.arange(n)
+                order = picked[np.lexsort((ids[picked], -row[picked]))[:k]]
+                results.append([self.items[i] for i in order.tolist()])
+        return results
+
+class FrozenCatalog:
+    """Immutable, compact copy of what scoring needs: item ids, precomputed rating terms
+    and the category index as position arrays. Batch workers get it once at startup
+    (inherited copy-on-write where processes fork) instead of the live trees."""
+    __slots__ = ('item_ids', 'rating_scores', 'categories', 'fallback')
+    
+    def __init__(self, items: Iterable[ContentItem]):
+        items = list(items)
+        self.item_ids = array('q', (item.item_id for item in items))
+        self.rating_scores = array('d', (item.avg_rating / 5.0 * 0.4 for item in items))
+        positions: Dict[str, List[int]] = {}
+        for pos, item in enumerate(items):
+            for category in set(item.categories):
+                positions.setdefault(category, []).append(pos)
+        self.categories = {category: array('l', p) for category, p in positions.items()}
+        self.fallback = array('l', sorted(range(len(items)), key=lambda p: (-self.rating_scores[p], self.item_ids[p])))
+    
+    def recommend(self, preferences: Iterable[str], limit: int) -> List[int]:
+        # Same candidates, scores and tie-breaks as RecommendationEngine.get_recommendations
+        if limit <= 0:
+            return []
+        counts: Dict[int, int] = {}
+        for category in set(preferences):
+            for pos in self.categories.get(category, ()):
+                counts[pos] = counts.get(pos, 0) + 1
+        ids, rating_scores = self.item_ids, self.rating_scores
+        best = nlargest(limit, ((count * 0.6 + rating_scores[pos], -ids[pos]) for pos, count in counts.items()))
+        result = [-neg_id for score, neg_id in best]
+        if len(result) < limit:
+            rest = (ids[pos] for pos in self.fallback if pos not in counts)
+            result.extend(islice(rest, limit - len(result)))
+        return result
+
+_worker_catalog: Optional[FrozenCatalog] = None
+
+def _init_recommend_worker(catalog: FrozenCatalog):
+    global _worker_catalog
+    _worker_catalog = catalog
+
+def _recommend_chunk(job: Tuple[int, List[Tuple[int, List[str]]]]) -> List[Tuple[int, List[int]]]:
+    limit, users = job
+    return [(user_id, _worker_catalog.recommend(preferences, limit)) for user_id, preferences in users]
+
+class RecommendationCache:
+    """LRU cache of per-user (item, score) lists. The engine drops an entry only when a
+    change can alter that user's list, so repeat requests are served without rescoring."""
+    
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        # user_id -> (limit, preference set, [(item, score)], ids of those items)
+        self._entries: 'OrderedDict[int, Tuple[int, frozenset, List[Tuple[ContentItem, float]], set]]' = OrderedDict()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+    
+    def get(self, user_id: int, limit: int) -> Optional[List[Tuple[ContentItem, float]]]:
+        entry = self._entries.get(user_id)
+        # A longer cached list starts with the shorter one; a short list already holds every item
+        if entry is not None and (limit <= entry[0] or len(entry[2]) < entry[0]):
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[2][:limit]
+        self.misses += 1
+        return None
+    
+    def put(self, user_id: int, limit: int, preferences: Iterable[str], results: List[Tuple[ContentItem, float]]):
+        self._entries[user_id] = (limit, frozenset(preferences), results, {item.item_id for item, score in results})
+        self._entries.move_to_end(user_id)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, user_id: int):
+        if self._entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+    
+    def invalidate_if(self, affected: Callable[..., bool]):
+        # `affected(limit, preferences, results, item_ids)` decides per cached user
+        for user_id in [u for u, entry in self._entries.items() if affected(*entry)]:
+            self.invalidate(user_id)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0, "evictions": self.evictions,
+                "invalidations": self.invalidations}
 
 class RecommendationEngine:
-    def __init__(self):
-        self.users_bst = BinarySearchTree()
-        self.content_avl = AVLTree()
+    JOURNALED = ('add_user', 'add_content', 'rate_content', 'update_preferences')
+    journal: Optional[PersistentStore] = None
+    
+    def __init__(self, user_backend: Any = "avl", content_backend: Any = "avl", vectorized: bool = False,
+                 cache_size: int = 1024, rating_backend: Any = "avl"):
+        self.users_bst = create_index(user_backend, key=lambda u: u.user_id)
+        self.content_avl = create_index(content_backend, key=lambda c: c.item_id)
         self.user_counter = 1
         self.content_counter = 1
+        self.scorer = VectorScorer() if vectorized else None
+        self.cache = RecommendationCache(cache_size)
+        # Inverted index category -> {item_id: item}, so only items sharing a category get scored
+        self.category_index: Dict[str, Dict[int, ContentItem]] = {}
+        # Rating order, globally and per category; items are re-keyed whenever they are rated
+        self._rating_backend = rating_backend
+        self.rating_index = create_index(rating_backend, key=self._rating_key)
+        self.category_rating_index: Dict[str, TreeInterface] = {}
+        # Zero-overlap order for padding recommendations: rating score descending, then item_id
+        self._fallback_index = create_index(rating_backend, key=lambda c: (-(c.avg_rating / 5.0 * 0.4), c.item_id))
+        if self.content_avl.get_size():
+            # A catalog opened from a file arrives filled. The scoring indexes still keep
+            # every item in memory; only the ID index is served from the file.
+            for item in self.content_avl:
+                self._index_content(item)
+            self.content_counter = self.content_avl.find_max().item_id + 1
     
+    @journaled
     def add_user(self, name: str, preferences: List[str]) -> int:
         user = User(self.user_counter, name, preferences)
         self.users_bst.insert(user)
         self.user_counter += 1
         return user.user_id
     
+    @journaled
+    def update_preferences(self, user_id: int, preferences: List[str]) -> bool:
+        user = self._find_user(user_id)
+        if not user:
+            return False
+        user.preferences = list(preferences)
+        self.cache.invalidate(user_id)
+        return True
+    
+    @journaled
     def add_content(self, title: str, categories: List[str], features: Dict) -> int:
         item = ContentItem(self.content_counter, title, categories, features)
         self.content_avl.insert(item)
+        self._index_content(item)
         self.content_counter += 1
+        # New items start unrated, so they can only reach lists they match a preference of,
+        # or lists that hold fewer items than asked for
+        new_categories = set(categories)
+        self.cache.invalidate_if(lambda limit, preferences, results, item_ids:
+                                 not preferences.isdisjoint(new_categories) or len(results) < limit)
         return item.item_id
     
-    def rate_content(self, user_id: int, item_id: int, rating: float):
+    def _index_content(self, item: ContentItem):
+        for category in set(item.categories):
+            self.category_index.setdefault(category, {})[item.item_id] = item
+        if self.scorer is not None:
+            self.scorer.add_item(item)
+        self._index_rating(item)
+    
+    @staticmethod
+    def _rating_key(item: ContentItem) -> Tuple[float, int, int]:
+        return (item.avg_rating, item.rating_count, item.item_id)
+    
+    def _rating_trees(self, item: ContentItem) -> Iterator[TreeInterface]:
+        yield self.rating_index
+        yield self._fallback_index
+        for category in set(item.categories):
+            tree = self.category_rating_index.get(category)
+            if tree is None:
+                tree = self.category_rating_index[category] = create_index(self._rating_backend, key=self._rating_key)
+            yield tree
+    
+    def _index_rating(self, item: ContentItem):
+        for tree in self._rating_trees(item):
+            tree.insert(item)
+    
+    def _unindex_rating(self, item: ContentItem):
+        # Must run before the rating changes: the trees are keyed on the old values
+        for tree in self._rating_trees(item):
+            tree.delete(item)
+    
+    @journaled
+    def rate_content(self, user_id: int, item_id: int, rating: float) -> bool:
         user = self._find_user(user_id)
         item = self._find_content(item_id)
         if user and item:
             user.rating_history.append((item_id, rating))
+            self._unindex_rating(item)
             item.update_rating(rating)
+            # A file-backed catalog hands out copies: store this one back and point the
+            # in-memory indexes at it
+            self.content_avl.replace(item)
+            for category in set(item.categories):
+                self.category_index[category][item_id] = item
+            self._index_rating(item)
+            if self.scorer is not None:
+                self.scorer.update_rating(item)
+            
+            def affected(limit, preferences, results, item_ids):
+                # Its score moved, or it may now beat the last entry of a full list
+                if item_id in item_ids: return True
+                if len(results) < limit: return False
+                last_item, last_score = results[-1]
+                return (self._match_score(preferences, item), -item_id) > (last_score, -last_item.item_id)
+            self.cache.invalidate_if(affected)
+            return True
+        return False
     
     def get_recommendations(self, user_id: int, limit: int = 5) -> List[ContentItem]:
+        return [item for item, score in self.get_scored_recommendations(user_id, limit)]
+    
+    def get_scored_recommendations(self, user_id: int, limit: int = 5) -> List[Tuple[ContentItem, float]]:
+        if limit <= 0:
+            return []
+        cached = self.cache.get(user_id, limit)
+        if cached is not None:
+            return cached
         user = self._find_user(user_id)
         if not user:
             return []
         
-        # Simple collaborative filtering based on user preferences
-        all_content = self.content_avl.traverse_inorder()
-        recommendations = []
+        # Candidates: items sharing at least one category with the user. Walking the index
+        # once per preference counts the category overlap without building sets per item.
+        candidates: Dict[int, List[Any]] = {}
+        for category in set(user.preferences):
+            for item_id, item in self.category_index.get(category, {}).items():
+                entry = candidates.get(item_id)
+                if entry:
+                    entry[0] += 1
+                else:
+                    candidates[item_id] = [1, item]
         
-        for item in all_content:
-            score = self._calculate_match_score(user, item)
-            recommendations.append((item, score))
+        # Bounded heap instead of a full sort; ties go to the lower item_id as before
+        scored = ((category_match * 0.6 + item.avg_rating / 5.0 * 0.4, -item.item_id, item)
+                  for category_match, item in candidates.values())
+        recommendations = [(item, score) for score, neg_id, item in nlargest(limit, scored)]
         
-        # Sort by score and return top recommendations
-        recommendations.sort(key=lambda x: x[1], reverse=True)
-        return [item for item, score in recommendations[:limit]]
+        # Any candidate outscores every non-matching item, so pad with the best rated of the rest
+        if len(recommendations) < limit:
+            rest = (item for item in self._fallback_index if item.item_id not in candidates)
+            recommendations.extend((item, item.avg_rating / 5.0 * 0.4)
+                                   for item in islice(rest, limit - len(recommendations)))
+        self.cache.put(user_id, limit, user.preferences, recommendations)
+        return recommendations[:]
+    
+    def recommend_batch(self, user_ids: Iterable[int], limit: int = 5) -> Dict[int, List[ContentItem]]:
+        # Same results as get_recommendations per user; with a VectorScorer the users are
+        # scored together by matrix products instead of one at a time
+        users = [self._find_user(user_id) for user_id in user_ids]
+        if self.scorer is None:
+            return {user.user_id: self.get_recommendations(user.user_id, limit) for user in users if user}
+        users = [user for user in users if user]
+        ranked = self.scorer.top_k([user.preferences for user in users], limit)
+        return {user.user_id: items for user, items in zip(users, ranked)}
+    
+    def recommend_all(self, limit: int = 5, workers: Optional[int] = None,
+                      chunk_size: int = 512) -> Iterator[Tuple[int, List[int]]]:
+        # Nightly batch: yields (user_id, [item_id, ...]) for every user in user_id order.
+        # Users are split into chunks scored in a process pool against a frozen catalog;
+        # results stream back in order while later chunks are still being scored.
+        catalog = FrozenCatalog(self.content_avl)
+        # Taken up front: the pool's feeder thread pulls jobs while the caller may be
+        # changing the user tree between results
+        users = iter([(user.user_id, list(user.preferences)) for user in self.users_bst])
+        jobs = ((limit, chunk) for chunk in iter(lambda: list(islice(users, chunk_size)), []))
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers <= 1:
+            _init_recommend_worker(catalog)
+            for job in jobs:
+                yield from _recommend_chunk(job)
+            return
+        # Not fork, as in PoolDispatcher: the caller's threads (WAL flusher, GUI workers) may
+        # hold locks the child would inherit. The catalog is pickled once per worker via initargs.
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        with context.Pool(workers, initializer=_init_recommend_worker, initargs=(catalog,)) as pool:
+            for results in pool.imap(_recommend_chunk, jobs):
+                yield from results
+    
+    def top_rated(self, k: int = 10, category: Optional[str] = None) -> List[ContentItem]:
+        # Highest average rating first; more ratings, then the newer item, break ties
+        tree = self.rating_index if category is None else self.category_rating_index.get(category)
+        return list(islice(reversed(tree), k)) if tree is not None else []
+    
+    def rated_above(self, threshold: float, category: Optional[str] = None,
+                    limit: Optional[int] = None) -> List[ContentItem]:
+        # Walks down from the top and stops at the first item at or below the threshold
+        tree = self.rating_index if category is None else self.category_rating_index.get(category)
+        if tree is None:
+            return []
+        return list(islice(takewhile(lambda item: item.avg_rating > threshold, reversed(tree)), limit))
+    
+    def popular_fallback(self, user_id: int, limit: int = 5) -> List[ContentItem]:
+        # For users whose preferences match nothing: the best rated items they haven't rated
+        user = self._find_user(user_id)
+        seen = {item_id for item_id, rating in user.rating_history} if user else set()
+        return list(islice((item for item in reversed(self.rating_index) if item.item_id not in seen), limit))
     
     def _calculate_match_score(self, user: User, item: ContentItem) -> float:
+        return self._match_score(set(user.preferences), item)
+    
+    @staticmethod
+    def _match_score(preferences: set, item: ContentItem) -> float:
         # Simple scoring based on category overlap and ratings
-        category_match = len(set(user.preferences) & set(item.categories))
+        category_match = len(preferences.intersection(item.categories))
         rating_score = item.avg_rating / 5.0  # Normalize to 0-1
         return category_match * 0.6 + rating_score * 0.4
     
     def _find_user(self, user_id: int) -> Optional[User]:
-        users = self.users_bst.traverse_inorder()
-        for user in users:
-            if user.user_id == user_id:
-                return user
-        return None
+        return self.users_bst.get(user_id)
     
     def _find_content(self, item_id: int) -> Optional[ContentItem]:
-        items = self.content_avl.traverse_inorder()
-        for item in items:
-            if item.item_id == item_id:
-                return item
-        return None
+        return self.content_avl.get(item_id)
+    
+    def snapshot_state(self) -> Dict[str, Any]:
+        users = [(u.user_id, u.name, u.preferences, u.rating_history) for u in self.users_bst]
+        content = [c.to_record() for c in self.content_avl]
+        return {"user_counter": self.user_counter, "content_counter": self.content_counter,
+                "users": users, "content": content}
+    
+    def restore_state(self, state: Dict[str, Any]):
+        users = []
+        for user_id, name, preferences, history in state["users"]:
+            user = User(user_id, name, preferences)
+            user.rating_history = [tuple(entry) for entry in history]
+            users.append(user)
+        content = [ContentItem.from_record(fields) for fields in state["content"]]
+        self.users_bst.bulk_insert(users)
+        self.content_avl.bulk_insert(content)
+        for item in content:
+            self._index_content(item)
+        self.user_counter = state["user_counter"]
+        self.content_counter = state["content_counter"]
 
 # =============================================================================
 # PROJECT 3: REAL-TIME TASK SCHEDULER
 # =============================================================================
 
+def _day_ordinal(when: Any) -> int:
+    # Day number (date.toordinal) of an ordinal, a date/datetime or a YYYY-MM-DD string
+    if isinstance(when, int):
+        return when
+    if isinstance(when, str):
+        when = date.fromisoformat(when)
+    return when.toordinal()
+
 class Task:
+    __slots__ = ('task_id', 'name', 'priority', 'duration', 'deadline', 'due', 'status')
+    
     def __init__(self, task_id: int, name: str, priority: int, duration: int, deadline: str):
         self.task_id = task_id
         self.name = name
         self.priority = priority  # 1-10, 10 being highest
         self.duration = duration  # in minutes
         self.deadline = deadline  # YYYY-MM-DD
+        self.due = _day_ordinal(deadline)  # Parsed once; all deadline comparisons use this
         self.status = "pending"  # pending, in-progress, completed
     
     def __lt__(self, other):
         # Sort by priority first, then deadline
         if self.priority != other.priority:
             return self.priority > other.priority  # Higher priority first
-        return self.deadline < other.deadline
+        return self.due < other.due
     
     def __eq__(self, other):
         return self.task_id == other.task_id
@@ -541,66 +3915,636 @@ class Task:
     def __str__(self):
         return f"Task {self.task_id}: {self.name} (Priority: {self.priority}, Duration: {self.duration}min, Deadline: {self.deadline})"
 
-class TaskScheduler:
+class IndexedHeap:
+    """Binary min-heap of (key, item_id, value) entries plus an item_id -> position map,
+    so an entry can be removed or re-keyed by id in O(log n) and the minimum read in O(1).
+    Ids are unique, so ties on key fall to the id and values are never compared."""
+    
     def __init__(self):
-        self.priority_bst = BinarySearchTree()  # For priority-based scheduling
-        self.deadline_avl = AVLTree()  # For deadline monitoring
+        self._heap: List[Tuple[Any, Any, Any]] = []
+        self._pos: Dict[Any, int] = {}
+    
+    def __len__(self) -> int: return len(self._heap)
+    def __contains__(self, item_id: Any) -> bool: return item_id in self._pos
+    
+    def peek(self) -> Any:
+        return self._heap[0][2] if self._heap else None
+    
+    def push(self, item_id: Any, key: Any, value: Any):
+        if item_id in self._pos:
+            raise ValueError(f"{item_id!r} is already in the heap")
+        self._heap.append((key, item_id, value))
+        self._pos[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+    
+    def pop(self) -> Any:
+        return self.remove(self._heap[0][1]) if self._heap else None
+    
+    def remove(self, item_id: Any) -> Any:
+        i = self._pos.pop(item_id, None)
+        if i is None:
+            return None
+        entry, last = self._heap[i], self._heap.pop()
+        if i < len(self._heap):
+            # Fill the hole with the last entry, which may need to move either way
+            self._heap[i] = last
+            self._pos[last[1]] = i
+            if last > entry:
+                self._sift_down(i)
+            else:
+                self._sift_up(i)
+        return entry[2]
+    
+    def update(self, item_id: Any, key: Any) -> bool:
+        i = self._pos.get(item_id)
+        if i is None:
+            return False
+        old = self._heap[i]
+        self._heap[i] = (key, item_id, old[2])
+        if key > old[0]:
+            self._sift_down(i)
+        else:
+            self._sift_up(i)
+        return True
+    
+    def values(self) -> List[Any]:
+        # All values in heap order (a full sort; not for the hot path)
+        return [entry[2] for entry in sorted(self._heap)]
+    
+    def _sift_up(self, i: int):
+        heap, pos = self._heap, self._pos
+        entry = heap[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[i] = heap[parent]
+            pos[heap[i][1]] = i
+            i = parent
+        heap[i] = entry
+        pos[entry[1]] = i
+    
+    def _sift_down(self, i: int):
+        heap, pos = self._heap, self._pos
+        n, entry = len(heap), heap[i]
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            if child + 1 < n and heap[child + 1] < heap[child]:
+                child += 1
+            if not heap[child] < entry:
+                break
+            heap[i] = heap[child]
+            pos[heap[i][1]] = i
+            i = child
+        heap[i] = entry
+        pos[entry[1]] = i
+
+class TaskScheduler:
+    JOURNALED = ('add_task', 'start_task', 'complete_task', 'change_priority')
+    STATUSES = ("pending", "in-progress", "completed")
+    URGENT_DAYS = 3  # get_urgent_tasks: overdue or due within this many days
+    journal: Optional[PersistentStore] = None
+    
+    def __init__(self, deadline_backend: Any = "avl", index_backend: Any = "avl"):
+        # Pending tasks by priority (highest first), then earliest deadline, then task_id
+        self.ready = IndexedHeap()
+        # One deadline index per status, keyed (due day, task_id), so deadline queries never
+        # step over completed tasks
+        self.deadlines = {status: create_index(deadline_backend, key=self._deadline_key) for status in self.STATUSES}
+        self.deadline_avl = self.deadlines["pending"]  # For deadline monitoring
+        self.tasks_by_id = create_index(index_backend, key=lambda t: t.task_id)  # For lookup by task ID
         self.task_counter = 1
     
+    @journaled
     def add_task(self, name: str, priority: int, duration: int, deadline: str) -> int:
         task = Task(self.task_counter, name, priority, duration, deadline)
-        self.priority_bst.insert(task)
-        self.deadline_avl.insert((deadline, task))
+        self.ready.push(task.task_id, self._ready_key(task), task)
+        self.deadline_avl.insert(task)
+        self.tasks_by_id.insert(task)
         self.task_counter += 1
         return task.task_id
     
+    @staticmethod
+    def _ready_key(task: Task) -> Tuple[int, int]:
+        return (-task.priority, task.due)
+    
+    @staticmethod
+    def _deadline_key(task: Task) -> Tuple[int, int]:
+        return (task.due, task.task_id)
+    
+    def _set_status(self, task: Task, status: str):
+        self.deadlines[task.status].delete(task)
+        task.status = status
+        self.deadlines[status].insert(task)
+    
     def get_next_task(self) -> Optional[Task]:
-        # Get highest priority task
-        if self.priority_bst.get_size() == 0:
-            return None
-        return self.priority_bst.find_max()  # Since we defined higher priority as "greater"
+        # Highest priority task, earliest deadline among equals; O(1)
+        return self.ready.peek()
+    
+    @journaled
+    def start_task(self, task_id: int) -> bool:
+        # pending -> in-progress: the task leaves the ready heap but stays open for deadline queries
+        task = self._find_task(task_id)
+        if not task or task.status != "pending":
+            return False
+        self.ready.remove(task_id)
+        self._set_status(task, "in-progress")
+        return True
+    
+    @journaled
+    def change_priority(self, task_id: int, priority: int) -> bool:
+        task = self._find_task(task_id)
+        if not task:
+            return False
+        task.priority = priority
+        self.ready.update(task_id, self._ready_key(task))
+        return True
+    
+    def tasks_by_priority(self) -> List[Task]:
+        return self.ready.values()
     
+    @journaled
     def complete_task(self, task_id: int) -> bool:
         task = self._find_task(task_id)
-        if task:
-            self.priority_bst.delete(task)
-            self.deadline_avl.delete((task.deadline, task))
+        if task and task.status != "completed":
+            self.ready.remove(task_id)
+            self._set_status(task, "completed")
             return True
         return False
     
-    def get_urgent_tasks(self) -> List[Task]:
-        urgent = []
-        deadline_tasks = self.deadline_avl.traverse_inorder()
-        # Simple urgency detection (tasks due soon)
-        for deadline, task in deadline_tasks:
-            if task.status == "pending":
-                urgent.append(task)
-        return urgent[:5]  # Return top 5 urgent tasks
+    def _open_by_deadline(self, lo: Optional[int] = None, hi: Optional[int] = None) -> Iterator[Task]:
+        # Pending and in-progress tasks with lo <= due day <= hi, earliest first; each
+        # partition is range-scanned and the two are merged lazily
+        lo_key = None if lo is None else (lo,)
+        hi_key = None if hi is None else (hi, float('inf'))
+        return merge(self.deadlines["pending"].range(lo_key, hi_key),
+                     self.deadlines["in-progress"].range(lo_key, hi_key), key=self._deadline_key)
+    
+    def due_before(self, when: Any) -> List[Task]:
+        # Open tasks due strictly before `when` (a date, YYYY-MM-DD string or day ordinal)
+        return list(self._open_by_deadline(None, _day_ordinal(when) - 1))
+    
+    def due_within(self, days: int, today: Any = None) -> List[Task]:
+        start = _day_ordinal(today if today is not None else date.today())
+        return list(self._open_by_deadline(start, start + days))
+    
+    def overdue(self, now: Any = None) -> List[Task]:
+        return self.due_before(now if now is not None else date.today())
+    
+    def get_urgent_tasks(self, limit: int = 5) -> List[Task]:
+        # Overdue tasks and those due in the next URGENT_DAYS days, earliest deadline first
+        horizon = date.today().toordinal() + self.URGENT_DAYS
+        return list(islice(self._open_by_deadline(None, horizon), limit))
+    
+    def get_tasks_due_between(self, start: Any, end: Any) -> List[Task]:
+        return list(self._open_by_deadline(_day_ordinal(start), _day_ordinal(end)))
     
     def _find_task(self, task_id: int) -> Optional[Task]:
-        tasks = self.priority_bst.traverse_inorder()
+        return self.tasks_by_id.get(task_id)
+    
+    def snapshot_state(self) -> Dict[str, Any]:
+        tasks = [(t.task_id, t.name, t.priority, t.duration, t.deadline, t.status) for t in self.tasks_by_id]
+        return {"counter": self.task_counter, "tasks": tasks}
+    
+    def restore_state(self, state: Dict[str, Any]):
+        tasks = []
+        for task_id, name, priority, duration, deadline, status in state["tasks"]:
+            task = Task(task_id, name, priority, duration, deadline)
+            task.status = status
+            tasks.append(task)
+        self.tasks_by_id.bulk_insert(tasks)
+        for status, tree in self.deadlines.items():
+            tree.bulk_insert(task for task in tasks if task.status == status)
         for task in tasks:
-            if task.task_id == task_id:
-                return task
-        return None
+            if task.status == "pending":
+                self.ready.push(task.task_id, self._ready_key(task), task)
+        self.task_counter = state["counter"]
+
+# =============================================================================
+# REAL-TIME EXECUTION: ASYNCIO RUNNER + HIERARCHICAL TIMING WHEEL
+# =============================================================================
+
+class TimingWheel:
+    """Hierarchical timing wheel over integer ticks: `levels` wheels of `slots` slots, a
+    level-l slot spanning slots**l ticks. Scheduling and cancelling are O(1); each tick
+    expires one level-0 slot and, when a level wraps, spreads one slot of the level above
+    back down. Timers beyond the top level wait in an overflow bucket. Stretches where the
+    lower levels are empty are skipped rather than stepped through."""
+    
+    def __init__(self, slots: int = 64, levels: int = 4, now: int = 0):
+        if slots < 2 or slots & (slots - 1):
+            raise ValueError("slots must be a power of two")
+        self.now = now
+        self._shift = slots.bit_length() - 1
+        self._mask = slots - 1
+        self._levels = levels
+        self._wheels: List[List[Dict[int, Tuple[int, Any]]]] = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._overflow: Dict[int, Tuple[int, Any]] = {}
+        self._where: Dict[int, Tuple[Dict[int, Tuple[int, Any]], int]] = {}  # handle -> (bucket, level)
+        self._counts = [0] * (levels + 1)  # Timers per level, overflow last
+        self._next_handle = 0
+    
+    def __len__(self) -> int: return len(self._where)
+    
+    def schedule(self, tick: int, item: Any) -> int:
+        # Timers at or before `now` expire on the next advance
+        handle = self._next_handle
+        self._next_handle += 1
+        self._place(handle, max(tick, self.now + 1), item)
+        return handle
+    
+    def cancel(self, handle: int) -> bool:
+        where = self._where.pop(handle, None)
+        if where is None:
+            return False
+        bucket, level = where
+        del bucket[handle]
+        self._counts[level] -= 1
+        return True
+    
+    def _place(self, handle: int, tick: int, item: Any):
+        delta, level = tick - self.now, 0
+        while level < self._levels and delta >> (self._shift * (level + 1)):
+            level += 1
+        if level == self._levels:
+            bucket = self._overflow
+        else:
+            bucket = self._wheels[level][(tick >> (self._shift * level)) & self._mask]
+        bucket[handle] = (tick, item)
+        self._where[handle] = (bucket, level)
+        self._counts[level] += 1
+    
+    def _cascade(self, level: int):
+        if level == self._levels:
+            bucket = self._overflow
+        else:
+            index = (self.now >> (self._shift * level)) & self._mask
+            if index == 0:
+                self._cascade(level + 1)  # Refill this level from the one above first
+            bucket = self._wheels[level][index]
+        entries = list(bucket.items())
+        bucket.clear()
+        self._counts[level] -= len(entries)
+        for handle, (tick, item) in entries:
+            self._place(handle, tick, item)
+    
+    def advance(self, to_tick: int) -> List[Any]:
+        # Move the clock to `to_tick` and return the items of every timer that expired
+        expired: List[Any] = []
+        while self.now < to_tick:
+            # With levels below `level` empty nothing can expire before that level next wraps
+            level = 0
+            while level <= self._levels and not self._counts[level]:
+                level += 1
+            if level > self._levels:
+                self.now = to_tick  # Nothing armed
+                break
+            if level:
+                span = 1 << (self._shift * min(level, self._levels))
+                self.now = min(to_tick, (self.now | (span - 1)))
+                if self.now == to_tick:
+                    break
+            self.now += 1
+            index = self.now & self._mask
+            if index == 0:
+                self._cascade(1)
+            bucket = self._wheels[0][index]
+            for handle, (tick, item) in bucket.items():
+                del self._where[handle]
+                expired.append(item)
+            self._counts[0] -= len(bucket)
+            bucket.clear()
+        return expired
+
+class TaskMetrics(NamedTuple):
+    task_id: int
+    wait: float      # Seconds from submission to start
+    run: float       # Seconds the handler took
+    lateness: float  # Seconds past the end of the due day at completion (negative if early)
+    error: Optional[str]
+
+def _deadline_instant(task: Task) -> float:
+    # A task is due by the end of its deadline day, local time
+    return datetime.combine(date.fromordinal(task.due + 1), datetime.min.time()).timestamp()
+
+class AsyncTaskRunner:
+    """Runs a TaskScheduler's tasks on an asyncio loop. `concurrency` worker coroutines
+    each take the scheduler's next task (priority, then deadline), mark it in-progress,
+    await `handler(task)` and complete it, so dispatch is a heap pop with no polling.
+    Deadlines are armed in a TimingWheel that fires `on_deadline_miss(task)` once for
+    every task still open when its due day ends. The default handler sleeps
+    `duration * time_scale` seconds."""
+    
+    def __init__(self, scheduler: TaskScheduler, handler: Optional[Callable[[Task], Any]] = None,
+                 concurrency: int = 8, resolution: float = 1.0, time_scale: float = 0.001,
+                 on_deadline_miss: Optional[Callable[[Task], Any]] = None, history: int = 10000):
+        self.scheduler = scheduler
+        self.handler = handler or self._simulate
+        self.concurrency = concurrency
+        self.resolution = resolution  # Seconds per timing wheel tick
+        self.time_scale = time_scale
+        self.on_deadline_miss = on_deadline_miss
+        self.wheel = TimingWheel(now=self._tick())
+        self.metrics: Deque[TaskMetrics] = deque(maxlen=history)  # Most recent completions
+        self.completed = self.failed = self.deadline_misses = 0
+        self.total_wait = self.total_lateness = self.max_wait = 0.0
+        self._submitted: Dict[int, float] = {}
+        self._timers: Dict[int, int] = {}
+        self._running = 0
+        self._stopping = False
+        self._wake: Optional[asyncio.Event] = None
+    
+    def _tick(self) -> int:
+        return int(time.time() / self.resolution)
+    
+    async def _simulate(self, task: Task):
+        await asyncio.sleep(task.duration * self.time_scale)
+    
+    def _arm(self, task: Task):
+        self._submitted.setdefault(task.task_id, time.perf_counter())
+        if task.task_id not in self._timers:
+            tick = int(_deadline_instant(task) / self.resolution)
+            self._timers[task.task_id] = self.wheel.schedule(tick, task)
+    
+    def submit(self, name: str, priority: int, duration: int, deadline: str) -> int:
+        task_id = self.scheduler.add_task(name, priority, duration, deadline)
+        self._arm(self.scheduler._find_task(task_id))
+        if self._wake is not None:
+            self._wake.set()
+        return task_id
+    
+    def stop(self):
+        self._stopping = True
+        if self._wake is not None:
+            self._wake.set()
+    
+    async def run(self, until_idle: bool = True):
+        # Returns once nothing is pending or running (until_idle) or after stop()
+        self._stopping = False
+        self._wake = asyncio.Event()
+        for task in self.scheduler.deadlines["pending"]:
+            self._arm(task)
+        ticker = asyncio.ensure_future(self._tick_loop())
+        try:
+            await asyncio.gather(*(self._worker(until_idle) for _ in range(self.concurrency)))
+        finally:
+            ticker.cancel()
+            self._wake = None
+    
+    async def _worker(self, until_idle: bool):
+        scheduler = self.scheduler
+        while not self._stopping:
+            task = scheduler.get_next_task()
+            if task is None:
+                if until_idle and self._running == 0:
+                    self.stop()
+                    break
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            scheduler.start_task(task.task_id)
+            self._running += 1
+            started = time.perf_counter()
+            error = None
+            try:
+                await self.handler(task)
+            except Exception as exc:
+                error = repr(exc)
+            finally:
+                self._running -= 1
+            self._finish(task, started, error)
+            if self._running == 0 and not len(scheduler.ready):
+                self._wake.set()  # Let idle workers re-check whether everything is done
+    
+    def _finish(self, task: Task, started: float, error: Optional[str]):
+        finished = time.perf_counter()
+        self.scheduler.complete_task(task.task_id)
+        handle = self._timers.pop(task.task_id, None)
+        if handle is not None:
+            self.wheel.cancel(handle)
+        wait = started - self._submitted.pop(task.task_id, started)
+        lateness = time.time() - _deadline_instant(task)
+        self.metrics.append(TaskMetrics(task.task_id, wait, finished - started, lateness, error))
+        self.completed += 1
+        self.failed += error is not None
+        self.total_wait += wait
+        self.total_lateness += lateness
+        self.max_wait = max(self.max_wait, wait)
+    
+    async def _tick_loop(self):
+        while True:
+            await asyncio.sleep(self.resolution)
+            for task in self.wheel.advance(self._tick()):
+                self._timers.pop(task.task_id, None)
+                if task.status != "completed":
+                    self.deadline_misses += 1
+                    if self.on_deadline_miss is not None:
+                        self.on_deadline_miss(task)
+    
+    def summary(self) -> Dict[str, float]:
+        done = self.completed or 1
+        return {"completed": self.completed, "failed": self.failed, "deadline_misses": self.deadline_misses,
+                "mean_wait": self.total_wait / done, "max_wait": self.max_wait,
+                "mean_lateness": self.total_lateness / done}
+
+# =============================================================================
+# PARALLEL EXECUTION: THREAD / PROCESS POOL DISPATCHER
+# =============================================================================
+
+def _simulate_cpu_task(task: Task) -> int:
+    # Default CPU-bound job: module level so a process pool can pickle it
+    total = 0
+    for i in range(task.duration * 1000):
+        total += i * i
+    return total
+
+class PoolDispatcher:
+    """Runs a TaskScheduler's tasks on a thread or process pool. Each of `workers` lanes
+    owns a deque: it takes from its own front, steals from the back of the others, and
+    only when every deque is empty refills them under the scheduler lock with the next
+    `fairness_window` tasks in priority order, dealt round-robin. Tasks in one window may
+    be taken in any order, but none is taken before every task of earlier windows was.
+    
+    Lanes are threads; with executor="process" each lane hands its task to a process
+    pool and waits, so at most `workers` jobs are ever queued on the pool and the rest
+    stay in the scheduler's heap where priority still applies. The pool starts workers
+    with forkserver or spawn, so a process `handler` must be a module-level function.
+    submit() blocks while `max_pending` tasks are waiting."""
+    
+    def __init__(self, scheduler: TaskScheduler, handler: Optional[Callable[[Task], Any]] = None,
+                 workers: Optional[int] = None, executor: str = "thread",
+                 fairness_window: Optional[int] = None, max_pending: Optional[int] = None,
+                 history: int = 10000):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown executor: {executor}")
+        self.scheduler = scheduler
+        self.handler = handler or _simulate_cpu_task
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.fairness_window = fairness_window or 4 * self.workers
+        self.max_pending = max_pending
+        self.metrics: Deque[TaskMetrics] = deque(maxlen=history)
+        self.completed = self.failed = self.steals = self.refills = 0
+        self._queues: List[Deque[Tuple[Task, float]]] = [deque() for _ in range(self.workers)]
+        self._cond = threading.Condition()  # Guards the scheduler and the counters
+        self._outstanding = 0  # Taken from the scheduler, not yet completed
+        self._stopping = False
+    
+    def submit(self, name: str, priority: int, duration: int, deadline: str,
+               timeout: Optional[float] = None) -> int:
+        with self._cond:
+            if self.max_pending is not None:
+                if not self._cond.wait_for(lambda: len(self.scheduler.ready) < self.max_pending, timeout):
+                    raise TimeoutError("Dispatcher is saturated")
+            task_id = self.scheduler.add_task(name, priority, duration, deadline)
+            self._cond.notify_all()
+            return task_id
+    
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+    
+    def run(self, until_idle: bool = True) -> Dict[str, float]:
+        # Blocks until nothing is pending or running (until_idle) or until stop()
+        self._stopping = False
+        pool = None
+        if self.executor == "process":
+            # Never fork: lane, WAL-flusher and runner threads may hold locks at that moment,
+            # and the child would inherit them locked. forkserver children come from a clean
+            # single-threaded server; spawn starts a fresh interpreter.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            pool = ProcessPoolExecutor(self.workers, mp_context=context)
+        try:
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="dispatch") as lanes:
+                for future in [lanes.submit(self._lane, index, pool, until_idle) for index in range(self.workers)]:
+                    future.result()
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return self.summary()
+    
+    def _lane(self, index: int, pool: Optional[ProcessPoolExecutor], until_idle: bool):
+        while True:
+            entry = self._take(index)
+            if entry is None:
+                with self._cond:
+                    if self._stopping:
+                        return
+                    if any(self._queues) or len(self.scheduler.ready):
+                        continue
+                    if until_idle and self._outstanding == 0:
+                        self._stopping = True
+                        self._cond.notify_all()
+                        return
+                    self._cond.wait()
+                continue
+            task, taken = entry
+            started = time.perf_counter()
+            error = None
+            try:
+                if pool is None:
+                    self.handler(task)
+                else:
+                    pool.submit(self.handler, task).result()
+            except Exception as exc:
+                error = repr(exc)
+            self._finish(task, taken, started, error)
+    
+    def _take(self, index: int) -> Optional[Tuple[Task, float]]:
+        # Own queue first, then steal; deque pops are atomic so neither needs the lock
+        try:
+            return self._queues[index].popleft()
+        except IndexError:
+            pass
+        for offset in range(1, self.workers):
+            try:
+                entry = self._queues[(index + offset) % self.workers].pop()
+            except IndexError:
+                continue
+            with self._cond:
+                self.steals += 1
+            return entry
+        return self._refill(index)
+    
+    def _refill(self, index: int) -> Optional[Tuple[Task, float]]:
+        with self._cond:
+            if self._stopping or any(self._queues):
+                return None  # Another lane refilled first
+            scheduler = self.scheduler
+            batch = []
+            while len(batch) < self.fairness_window:
+                task = scheduler.get_next_task()
+                if task is None:
+                    break
+                scheduler.start_task(task.task_id)
+                batch.append(task)
+            if not batch:
+                return None
+            self._outstanding += len(batch)
+            self.refills += 1
+            taken = time.perf_counter()
+            for position, task in enumerate(batch[1:], 1):
+                self._queues[(index + position) % self.workers].append((task, taken))
+            self._cond.notify_all()  # Wakes idle lanes and producers blocked on max_pending
+            return batch[0], taken
+    
+    def _finish(self, task: Task, taken: float, started: float, error: Optional[str]):
+        finished = time.perf_counter()
+        with self._cond:
+            self.scheduler.complete_task(task.task_id)
+            self._outstanding -= 1
+            self.metrics.append(TaskMetrics(task.task_id, started - taken, finished - started,
+                                            time.time() - _deadline_instant(task), error))
+            self.completed += 1
+            self.failed += error is not None
+            if self._outstanding == 0:
+                self._cond.notify_all()
+    
+    def summary(self) -> Dict[str, float]:
+        with self._cond:
+            done = len(self.metrics) or 1
+            return {"completed": self.completed, "failed": self.failed, "steals": self.steals,
+                    "refills": self.refills, "mean_wait": sum(m.wait for m in self.metrics) / done,
+                    "mean_run": sum(m.run for m in self.metrics) / done}
 
 # =============================================================================
 # TKINTER GUI APPLICATION
 # =============================================================================
 
 class TreeDSAGUI:
-    def __init__(self, root):
+    INVENTORY_PAGE_SIZE = 50
+    
+    def __init__(self, root, data_dir: Optional[str] = None):
         self.root = root
         self.root.title("Advanced Tree DSA Applications")
         self.root.geometry("1200x800")
         
         # Initialize project managers
-        self.inventory_manager = InventoryManager()
+        self.inventory_manager = InventoryManager(versioned=True)
         self.recommendation_engine = RecommendationEngine()
         self.task_scheduler = TaskScheduler()
+        self.inventory_offset = 0
+        
+        # With a data directory, each manager is recovered from disk and journals its changes
+        self.stores: List[PersistentStore] = []
+        if data_dir:
+            for name, manager in (("inventory", self.inventory_manager),
+                                  ("recommendations", self.recommendation_engine),
+                                  ("tasks", self.task_scheduler)):
+                self.stores.append(PersistentStore(manager, os.path.join(data_dir, name)))
+            self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         self.setup_gui()
     
+    def on_close(self):
+        for store in self.stores:
+            store.close()
+        self.root.destroy()
+    
     def setup_gui(self):
         # Create notebook for tabs
         notebook = ttk.Notebook(self.root)
@@ -662,6 +4606,13 @@ class TreeDSAGUI:
         ttk.Button(search_frame, text="Search", 
                   command=self.search_product).grid(row=1, column=0, columnspan=2, pady=5)
         
+        ttk.Label(search_frame, text="Category:").grid(row=2, column=0, sticky='w')
+        self.search_category_entry = ttk.Entry(search_frame, width=15)
+        self.search_category_entry.grid(row=2, column=1, padx=5, pady=2)
+        
+        ttk.Button(search_frame, text="Show Category", 
+                  command=self.show_category).grid(row=3, column=0, columnspan=2, pady=5)
+        
         # Right side - Display
         display_frame = ttk.LabelFrame(parent, text="Inventory", padding=10)
         display_frame.grid(row=0, column=1, rowspan=2, sticky='nsew', padx=5, pady=5)
@@ -675,8 +4626,14 @@ class TreeDSAGUI:
         
         ttk.Button(button_frame, text="Show All Products", 
                   command=self.show_all_products).pack(side='left', padx=2)
+        ttk.Button(button_frame, text="◀ Prev", 
+                  command=lambda: self.show_all_products(self.inventory_offset - self.INVENTORY_PAGE_SIZE)).pack(side='left', padx=2)
+        ttk.Button(button_frame, text="Next ▶", 
+                  command=lambda: self.show_all_products(self.inventory_offset + self.INVENTORY_PAGE_SIZE)).pack(side='left', padx=2)
         ttk.Button(button_frame, text="Show Low Stock", 
                   command=self.show_low_stock).pack(side='left', padx=2)
+        ttk.Button(button_frame, text="Undo", 
+                  command=self.undo_inventory).pack(side='left', padx=2)
         ttk.Button(button_frame, text="Clear Display", 
                   command=self.clear_inventory_display).pack(side='left', padx=2)
         
@@ -723,7 +4680,9 @@ class TreeDSAGUI:
         self.rec_user_id_entry.grid(row=0, column=1, padx=5, pady=2)
         
         ttk.Button(rec_frame, text="Get Recommendations", 
-                  command=self.get_recommendations).grid(row=1, column=0, columnspan=2, pady=5)
+                  command=self.get_recommendations).grid(row=1, column=0, pady=5)
+        ttk.Button(rec_frame, text="Top Rated", 
+                  command=self.show_top_rated).grid(row=1, column=1, pady=5)
         
         self.recommendation_text = scrolledtext.ScrolledText(rec_frame, width=60, height=15)
         self.recommendation_text.grid(row=2, column=0, columnspan=2, sticky='nsew', pady=5)
@@ -797,11 +4756,11 @@ class TreeDSAGUI:
         tree_selection_frame.pack(fill='x', pady=5)
         
         ttk.Label(tree_selection_frame, text="Select Tree:").pack(side='left')
-        self.tree_var = tk.StringVar(value="Inventory BST")
+        self.tree_var = tk.StringVar(value="Inventory ID Index")
         tree_combo = ttk.Combobox(tree_selection_frame, textvariable=self.tree_var,
-                                 values=["Inventory BST", "Inventory AVL", 
-                                        "Recommendation BST", "Recommendation AVL",
-                                        "Task BST", "Task AVL"])
+                                 values=["Inventory ID Index", "Inventory AVL", "Inventory Stock AVL",
+                                        "Recommendation ID Index", "Recommendation AVL",
+                                        "Task ID Index", "Task AVL"])
         tree_combo.pack(side='left', padx=5)
         
         ttk.Button(tree_selection_frame, text="Analyze Tree", 
@@ -848,21 +4807,45 @@ class TreeDSAGUI:
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid product ID!")
     
-    def show_all_products(self):
-        products = self.inventory_manager.products_bst.traverse_inorder()
-        self.display_products(products, "All Products")
+    def show_all_products(self, offset: int = 0):
+        # Page through the catalog with select-by-rank instead of materializing every product
+        products_bst = self.inventory_manager.products_bst
+        total = products_bst.get_size()
+        last_page = max(0, (total - 1) // self.INVENTORY_PAGE_SIZE * self.INVENTORY_PAGE_SIZE)
+        offset = max(0, min(offset, last_page))
+        self.inventory_offset = offset
+        products = products_bst.slice(offset, self.INVENTORY_PAGE_SIZE)
+        title = f"All Products ({offset + 1}-{offset + len(products)} of {total})" if products else "All Products"
+        self.display_products(products, title, total)
+    
+    def show_category(self):
+        category = self.search_category_entry.get().strip()
+        if not category:
+            messagebox.showerror("Error", "Please enter a category!")
+            return
+        products = self.inventory_manager.get_products_by_category(category)
+        self.display_products(products, f"Category: {category}")
+        summary = self.inventory_manager.get_category_summary(category)
+        self.inventory_text.insert(tk.END, f"Units in stock: {summary['units']}\n")
+        self.inventory_text.insert(tk.END, f"Inventory value: ${summary['value']:.2f}\n")
     
     def show_low_stock(self):
         low_stock = self.inventory_manager.get_low_stock_products()
         self.display_products(low_stock, "Low Stock Products (≤10)")
     
-    def display_products(self, products, title):
+    def undo_inventory(self):
+        if self.inventory_manager.undo():
+            self.show_all_products(self.inventory_offset)
+        else:
+            messagebox.showinfo("Undo", "Nothing to undo!")
+    
+    def display_products(self, products, title, total: Optional[int] = None):
         self.inventory_text.delete(1.0, tk.END)
         self.inventory_text.insert(tk.END, f"{title}:\n")
         self.inventory_text.insert(tk.END, "="*50 + "\n")
         for product in products:
             self.inventory_text.insert(tk.END, f"{product}\n")
-        self.inventory_text.insert(tk.END, f"\nTotal: {len(products)} products\n")
+        self.inventory_text.insert(tk.END, f"\nTotal: {len(products) if total is None else total} products\n")
     
     def clear_inventory_entries(self):
         self.name_entry.delete(0, tk.END)
@@ -912,24 +4895,32 @@ class TreeDSAGUI:
     def get_recommendations(self):
         try:
             user_id = int(self.rec_user_id_entry.get())
-            recommendations = self.recommendation_engine.get_recommendations(user_id)
+            recommendations = self.recommendation_engine.get_scored_recommendations(user_id)
             
             self.recommendation_text.delete(1.0, tk.END)
             if recommendations:
                 self.recommendation_text.insert(tk.END, f"Recommendations for User {user_id}:\n")
                 self.recommendation_text.insert(tk.END, "="*50 + "\n")
-                for i, item in enumerate(recommendations, 1):
-                    score = self.recommendation_engine._calculate_match_score(
-                        self.recommendation_engine._find_user(user_id), item
-                    )
+                for i, (item, score) in enumerate(recommendations, 1):
                     self.recommendation_text.insert(tk.END, 
                         f"{i}. {item.title} (Rating: {item.avg_rating:.1f}, Match: {score:.2f})\n")
                     self.recommendation_text.insert(tk.END, f"   Categories: {', '.join(item.categories)}\n\n")
+                stats = self.recommendation_engine.cache.stats()
+                self.recommendation_text.insert(tk.END, f"Cache: {stats['hit_rate']:.0%} hit rate, "
+                                                        f"{stats['evictions']} evictions\n")
             else:
                 self.recommendation_text.insert(tk.END, "No recommendations found or user doesn't exist.")
         except ValueError:
             messagebox.showerror("Error", "Please enter a valid user ID!")
     
+    def show_top_rated(self):
+        self.recommendation_text.delete(1.0, tk.END)
+        self.recommendation_text.insert(tk.END, "Top Rated Content:\n")
+        self.recommendation_text.insert(tk.END, "="*50 + "\n")
+        for i, item in enumerate(self.recommendation_engine.top_rated(10), 1):
+            self.recommendation_text.insert(tk.END, 
+                f"{i}. {item.title} (Rating: {item.avg_rating:.1f} from {item.rating_count} ratings)\n")
+    
     # Task Scheduler Methods
     def add_task(self):
         try:
@@ -946,7 +4937,7 @@ class TreeDSAGUI:
             else:
                 messagebox.showerror("Error", "Please enter valid values! Priority must be 1-10.")
         except ValueError:
-            messagebox.showerror("Error", "Please enter valid numbers!")
+            messagebox.showerror("Error", "Please enter valid numbers and a YYYY-MM-DD deadline!")
     
     def get_next_task(self):
         next_task = self.task_scheduler.get_next_task()
@@ -982,7 +4973,7 @@ class TreeDSAGUI:
             messagebox.showerror("Error", "Please enter a valid task ID!")
     
     def show_all_tasks(self):
-        tasks = self.task_scheduler.priority_bst.traverse_inorder()
+        tasks = self.task_scheduler.tasks_by_priority()
         self.task_text.delete(1.0, tk.END)
         if tasks:
             self.task_text.insert(tk.END, "All Tasks (Sorted by Priority):\n")
@@ -1003,30 +4994,40 @@ class TreeDSAGUI:
         tree_type = self.tree_var.get()
         self.analysis_text.delete(1.0, tk.END)
         
-        if tree_type == "Inventory BST":
+        if tree_type == "Inventory ID Index":
             tree = self.inventory_manager.products_bst
         elif tree_type == "Inventory AVL":
             tree = self.inventory_manager.categories_avl
-        elif tree_type == "Recommendation BST":
+        elif tree_type == "Inventory Stock AVL":
+            tree = self.inventory_manager.stock_avl
+        elif tree_type == "Recommendation ID Index":
             tree = self.recommendation_engine.users_bst
         elif tree_type == "Recommendation AVL":
             tree = self.recommendation_engine.content_avl
-        elif tree_type == "Task BST":
-            tree = self.task_scheduler.priority_bst
+        elif tree_type == "Task ID Index":
+            tree = self.task_scheduler.tasks_by_id
         elif tree_type == "Task AVL":
             tree = self.task_scheduler.deadline_avl
         else:
             return
+        if isinstance(tree, PersistentAVLTree):
+            tree = tree.snapshot()  # Every figure below comes from the same version
         
         self.analysis_text.insert(tk.END, f"Analysis of {tree_type}:\n")
         self.analysis_text.insert(tk.END, "="*50 + "\n")
+        stats = tree.stats() if hasattr(tree, 'stats') else None
         self.analysis_text.insert(tk.END, f"Size: {tree.get_size()} nodes\n")
         self.analysis_text.insert(tk.END, f"Height: {tree.get_height()}\n")
-        self.analysis_text.insert(tk.END, f"Minimum Value: {tree.find_min()}\n")
-        self.analysis_text.insert(tk.END, f"Maximum Value: {tree.find_max()}\n")
+        self.analysis_text.insert(tk.END, f"Minimum Value: {stats.min if stats else tree.find_min()}\n")
+        self.analysis_text.insert(tk.END, f"Maximum Value: {stats.max if stats else tree.find_max()}\n")
+        if stats:
+            self.analysis_text.insert(tk.END, f"Average Depth: {stats.average_depth:.2f}\n")
+            self.analysis_text.insert(tk.END, f"Leaf Count: {stats.leaf_count}\n")
+        self.analysis_text.insert(tk.END, f"Median Value: {tree.select(tree.get_size() // 2)}\n")
+        self.analysis_text.insert(tk.END, f"Bytes per node: {tree.bytes_per_node():.0f}\n")
         
         # Show first few elements
-        elements = tree.traverse_inorder()[:5]
+        elements = islice(tree.iter_inorder(), 5)
         self.analysis_text.insert(tk.END, f"\nFirst 5 elements (inorder):\n")
         for elem in elements:
             self.analysis_text.insert(tk.END, f"  {elem}\n")
@@ -1056,13 +5057,45 @@ class TreeDSAGUI:
                 avl.insert(random.randint(1, size * 10))
             avl_time = time.time() - start_time
             
+            # B+Tree Performance
+            bplus = BPlusTree()
+            start_time = time.time()
+            for i in range(size):
+                bplus.insert(random.randint(1, size * 10))
+            bplus_time = time.time() - start_time
+            
             self.analysis_text.insert(tk.END, f"  BST Insertion: {bst_time:.4f}s (Height: {bst.get_height()})\n")
             self.analysis_text.insert(tk.END, f"  AVL Insertion: {avl_time:.4f}s (Height: {avl.get_height()})\n")
+            self.analysis_text.insert(tk.END, f"  B+Tree Insertion: {bplus_time:.4f}s (Height: {bplus.get_height()})\n")
             self.analysis_text.insert(tk.END, f"  AVL is {avl_time/bst_time:.2f}x slower but {bst.get_height()/avl.get_height():.2f}x more balanced\n")
+        
+        # Same workload on every registered backend
+        self.analysis_text.insert(tk.END, "\nBackend comparison (5000 random keys):\n")
+        self.analysis_text.insert(tk.END, f"  {'Backend':<10} {'Insert':>8} {'Search':>8} {'Delete':>8} {'Height':>7}\n")
+        for name, result in benchmark_backends(5000).items():
+            self.analysis_text.insert(tk.END, f"  {name:<10} {result['insert']:>7.4f}s {result['search']:>7.4f}s "
+                                              f"{result['delete']:>7.4f}s {result['height']:>7}\n")
+        
+        # Shared inventory: reader threads query while one writer updates stock. That takes
+        # a couple of seconds, so it runs off the Tk thread and reports back through after()
+        self.analysis_text.insert(tk.END, "\nConcurrent inventory (4 readers, 1 writer): running...\n")
+        threading.Thread(target=self._run_stress_test, daemon=True).start()
+    
+    def _run_stress_test(self):
+        result = stress_inventory(readers=4, updates=500)
+        self.root.after(0, self._show_stress_result, result)
+    
+    def _show_stress_result(self, result: Dict[str, float]):
+        self.analysis_text.insert(tk.END, "\nConcurrent inventory (4 readers, 1 writer):\n")
+        self.analysis_text.insert(tk.END, f"  Reads/s idle: {result['reads_per_s']:.0f}, "
+                                          f"while writing: {result['reads_per_s_while_writing']:.0f}\n")
+        self.analysis_text.insert(tk.END, f"  Updates/s: {result['updates_per_s']:.0f}, "
+                                          f"consistency errors: {result['errors']}\n")
 
 def main():
     root = tk.Tk()
-    app = TreeDSAGUI(root)
+    # Optional first argument: directory to persist inventory, users, content and tasks in
+    app = TreeDSAGUI(root, sys.argv[1] if len(sys.argv) > 1 else None)
     root.mainloop()
 
 if __name__ == "__main__":